@@ -1,8 +1,13 @@
 import time
+import logging
 import pandas as pd
 import streamlit as st
 from openai import OpenAI
 from db_connection import DBConnection
+from vector_index import VectorIndex
+from embedding_cache import EmbeddingCache, EmbeddingService
+from semantic_cache import SemanticCache
+from hybrid import HybridRetriever
 
 MODEL = "gpt-3.5-turbo-0125"
 
@@ -14,7 +19,16 @@ def init_connection_sqlalchemy():
     db_host = st.secrets["DB_HOST"]
     db_port = st.secrets["DB_PORT"]
     db_name = st.secrets["DB_NAME"]
-    return DBConnection(db_user, db_password, db_host, db_port, db_name)
+    return DBConnection(
+        db_user,
+        db_password,
+        db_host,
+        db_port,
+        db_name,
+        pool_size=int(st.secrets.get("DB_POOL_SIZE", 5)),
+        max_overflow=int(st.secrets.get("DB_MAX_OVERFLOW", 10)),
+        statement_timeout_ms=int(st.secrets.get("DB_STATEMENT_TIMEOUT_MS", 5000)),
+    )
 
 
 @st.cache_resource
@@ -22,14 +36,44 @@ def init_connection_openai():
     return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
 
 
+@st.cache_resource
+def init_vector_index():
+    return VectorIndex(init_connection_sqlalchemy())
+
+
+@st.cache_resource
+def init_embedding_service(model="text-embedding-3-small"):
+    cache = EmbeddingCache(st.secrets.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite"))
+    return EmbeddingService(init_connection_openai(), cache, model=model)
+
+
+@st.cache_resource
+def init_semantic_cache():
+    return SemanticCache(threshold=float(st.secrets.get("SEMANTIC_CACHE_THRESHOLD", 0.95)))
+
+
+@st.cache_resource
+def init_hybrid_retriever():
+    shortlist = st.secrets.get("HYBRID_SHORTLIST")
+    return HybridRetriever(
+        init_vector_index(),
+        embed=get_embedding,
+        fusion=st.secrets.get("HYBRID_FUSION", "rrf"),
+        shortlist=int(shortlist) if shortlist else None,
+    )
+
+
 supabase = init_connection_sqlalchemy()
 client = init_connection_openai()
+vector_index = init_vector_index()
+semantic_cache = init_semantic_cache()
+# "dense" serves the embedding search only, "hybrid" fuses it with BM25
+RETRIEVER = st.secrets.get("RETRIEVER", "dense")
 
 
 @st.cache_data(ttl=600)
 def get_embedding(text, model="text-embedding-3-small") -> list:
-    text = text.replace("\n", " ")
-    return client.embeddings.create(input=[text], model=model).data[0].embedding
+    return init_embedding_service(model).embed(text)
 
 
 @st.cache_data(ttl=600)
@@ -38,14 +82,25 @@ def get_top_n_courses(query: str, n: int = 5):
     Get top n courses based on the cosine similarity.
     """
     assert isinstance(n, int), "n should be an integer."
+    if RETRIEVER == "hybrid":
+        courses = init_hybrid_retriever().search(query, n)
+        if courses is not None:
+            return courses
+
     embedding = get_embedding(query)
-    query = f"""
-        SELECT *
-        FROM course_embeddings
-        ORDER BY embedding_openai <=> '{embedding}' asc
-        LIMIT {n}
-        """
-    return supabase.query(query)
+
+    # Near-identical queries share their results
+    courses = semantic_cache.lookup(embedding, n)
+    if courses is not None:
+        return courses
+
+    # Serve from the in-process index, fall back to pgvector if it is stale
+    courses = vector_index.search(embedding, n)
+    if courses is None:
+        courses = supabase.top_n_by_embedding(embedding, n)
+
+    semantic_cache.store(embedding, courses=courses)
+    return courses
 
 
 def create_query(client, prompt):
@@ -90,9 +145,14 @@ def create_query(client, prompt):
     return completion.choices[0].message.content
 
 
-def infer_best_course(client, query, retriever_courses):
+def infer_best_course(client, query, retriever_courses, stream=False):
+    """
+    Ask the LLM for the best courses. With `stream=True` a CompletionStream of
+    the response tokens is returned as they arrive from the API.
+    """
     completion = client.chat.completions.create(
         model=MODEL,
+        stream=stream,
         messages=[
             {
                 "role": "system",
@@ -131,16 +191,53 @@ def infer_best_course(client, query, retriever_courses):
             },
         ],
     )
+    if stream:
+        return CompletionStream(completion)
     return completion.choices[0].message.content
 
 
-def response_streamer(response: str):
+class CompletionStream:
     """
-    Stream responses to the user.
+    Iterator over the text deltas of a streamed chat completion. Closing it
+    closes the HTTP response, also while another thread is waiting for a token.
     """
-    for word in response.split(" "):
-        yield word + " "
-        time.sleep(0.03)
+
+    def __init__(self, completion):
+        self.completion = completion
+        self.chunks = iter(completion)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        while True:
+            chunk = next(self.chunks)
+            if chunk.choices and chunk.choices[0].delta.content:
+                return chunk.choices[0].delta.content
+
+    def close(self):
+        self.completion.close()
+
+
+def response_streamer(response, start: float = None, metrics: list = None):
+    """
+    Stream responses to the user and record the time to first token and the
+    total time. `response` is either a complete string or a token generator.
+    `start` is the perf_counter time the request started.
+    """
+    start = time.perf_counter() if start is None else start
+    ttft = None
+
+    for chunk in [response] if isinstance(response, str) else response:
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        yield chunk
+
+    total = time.perf_counter() - start
+    ttft = total if ttft is None else ttft
+    logging.info(f"Response time to first token {ttft:.3f} s, total {total:.3f} s")
+    if metrics is not None:
+        metrics.append({"ttft": ttft, "total": total})
 
 
 def format_response(df: pd.DataFrame):
@@ -0,0 +1,66 @@
+import os
+import time
+import numpy as np
+
+from db_connection import DBConnection, COURSE_COLUMNS
+
+
+def string_query(db: DBConnection, embedding: list, n: int = 5):
+    """
+    The original query path: the embedding is pasted into the SQL text.
+    """
+    query = f"""
+        SELECT {", ".join(COURSE_COLUMNS)}
+        FROM course_embeddings
+        ORDER BY embedding_openai <=> '{embedding}' asc
+        LIMIT {n}
+        """
+    return db.query(query)
+
+
+def prepared_query(db: DBConnection, embedding: list, n: int = 5):
+    """
+    The parameterised query path with binary, prepared statements.
+    """
+    return db.top_n_by_embedding(embedding, n)
+
+
+def benchmark(func, db, embeddings, warmup=5):
+    """
+    Return the per-query latencies in milliseconds.
+    """
+    for embedding in embeddings[:warmup]:
+        func(db, embedding)
+
+    latencies = []
+    for embedding in embeddings:
+        start = time.perf_counter()
+        func(db, embedding)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+if __name__ == "__main__":
+
+    db = DBConnection(
+        os.environ.get("DB_USER"),
+        os.environ.get("DB_PASSWORD"),
+        os.environ.get("DB_HOST"),
+        os.environ.get("DB_PORT"),
+        os.environ.get("DB_NAME"),
+    )
+
+    # Random unit vectors with the dimensionality of text-embedding-3-small
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((200, 1536)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = [e.tolist() for e in embeddings]
+
+    for name, func in [("string", string_query), ("prepared", prepared_query)]:
+        latencies = benchmark(func, db, embeddings)
+        print(
+            f"{name:>8}: "
+            f"mean {latencies.mean():.2f} ms, "
+            f"p50 {np.percentile(latencies, 50):.2f} ms, "
+            f"p99 {np.percentile(latencies, 99):.2f} ms"
+        )
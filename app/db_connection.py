@@ -1,17 +1,99 @@
 import os
+import time
+import threading
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
+from typing import Iterable
+from pgvector.psycopg import register_vector
+from sqlalchemy import create_engine, event, text
+
+COURSE_COLUMNS = ["code", "name", "credits", "description", "url"]
 
 
 class DBConnection:
-    def __init__(self, db_user, db_password, db_host, db_port, db_name):
+    def __init__(
+        self,
+        db_user,
+        db_password,
+        db_host,
+        db_port,
+        db_name,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        statement_timeout_ms: int = 5000,
+    ):
+        """
+        Args:
+            pool_size (int): Number of connections kept open in the pool.
+            max_overflow (int): Extra connections allowed when the pool is exhausted.
+            pool_timeout (float): Seconds to wait for a free connection before failing.
+            pool_recycle (int): Seconds after which a connection is replaced, so that
+            connections dropped by the server or a proxy are not reused.
+            pool_pre_ping (bool): Test connections for liveness on checkout.
+            statement_timeout_ms (int): Server-side statement timeout, 0 disables it.
+        """
         self.db_user = db_user
         self.db_password = db_password
         self.db_host = db_host
         self.db_port = db_port
         self.db_name = db_name
-        self.db_url = f"postgresql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
-        self.engine = create_engine(self.db_url)
+        self.db_url = f"postgresql+psycopg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+        self.engine = create_engine(
+            self.db_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            connect_args={"options": f"-c statement_timeout={statement_timeout_ms}"},
+        )
+        # Teach every new connection to send and receive pgvector values in binary
+        event.listen(self.engine, "connect", self._register_vector)
+
+        # Checkout wait time statistics, see pool_stats()
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @staticmethod
+    def _register_vector(dbapi_connection, connection_record):
+        register_vector(dbapi_connection)
+
+    def _connect(self):
+        """
+        Check out a connection from the pool and record how long it took.
+        """
+        start = time.perf_counter()
+        connection = self.engine.connect()
+        wait = time.perf_counter() - start
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        return connection
+
+    def pool_stats(self) -> dict:
+        """
+        Current pool usage and checkout wait times for sizing the pool.
+        """
+        pool = self.engine.pool
+        with self._stats_lock:
+            checkouts = self._checkouts
+            wait_total = self._wait_total
+            wait_max = self._wait_max
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checkouts": checkouts,
+            "wait_mean_ms": 1000 * wait_total / checkouts if checkouts else 0.0,
+            "wait_max_ms": 1000 * wait_max,
+        }
 
     def test_connection(self):
         try:
@@ -24,11 +106,83 @@ class DBConnection:
 
     def query(self, query):
         assert isinstance(query, str), "Query must be a string"
-        with self.engine.connect() as connection:
+        with self._connect() as connection:
             result = connection.execute(text(query.strip()))
             df = pd.DataFrame(result.fetchall(), columns=result.keys())
         return df
 
+    def query_params(self, query: str, params=None, prepare: bool = True) -> pd.DataFrame:
+        """
+        Run a query with bound parameters. Use psycopg placeholders in the query,
+        `%s` for text and `%b` for binary parameters. With `prepare=True` the
+        statement is prepared on the server on first use and reused afterwards
+        on the same connection, so Postgres does not re-parse or re-plan it.
+        """
+        assert isinstance(query, str), "Query must be a string"
+        with self._connect() as connection:
+            cursor = connection.connection.driver_connection.cursor(binary=True)
+            with cursor:
+                cursor.execute(query.strip(), params, prepare=prepare)
+                columns = [col.name for col in cursor.description]
+                # Build the frame straight from the cursor without a fetchall() list
+                df = pd.DataFrame.from_records(cursor, columns=columns)
+        return df
+
+    def top_n_by_embedding(
+        self,
+        embedding,
+        n: int = 5,
+        table_name: str = "course_embeddings",
+        column: str = "embedding_openai",
+        columns: list[str] = COURSE_COLUMNS,
+    ) -> pd.DataFrame:
+        """
+        Get the top n rows by cosine similarity to the embedding. The embedding
+        is sent as a binary pgvector parameter instead of being pasted into the
+        SQL text.
+        """
+        assert isinstance(n, int), "n should be an integer."
+        embedding = np.asarray(embedding, dtype=np.float32)
+        query = f"""
+            SELECT {", ".join(columns)}, 1 - ({column} <=> %b) AS similarity
+            FROM {table_name}
+            ORDER BY {column} <=> %b asc
+            LIMIT %b
+            """
+        return self.query_params(query, (embedding, embedding, n))
+
+    def copy_records(
+        self,
+        table_name: str,
+        columns: list[str],
+        records: Iterable[tuple],
+        truncate: bool = False,
+        statement_timeout_ms: int = 0,
+    ) -> int:
+        """
+        Bulk load rows into a table with Postgres COPY. Vector columns must be
+        given as numpy arrays. With `truncate=True` the table is emptied in the
+        same transaction, so readers never see a half-loaded table. The load
+        runs with its own statement timeout, by default none, instead of the
+        connection's short query timeout.
+        Returns the number of rows written.
+        """
+        n_rows = 0
+        with self.engine.begin() as connection:
+            cursor = connection.connection.driver_connection.cursor()
+            with cursor:
+                # SET LOCAL only lasts until the end of this transaction
+                cursor.execute(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+                if truncate:
+                    cursor.execute(f"TRUNCATE {table_name}")
+                with cursor.copy(
+                    f"COPY {table_name} ({', '.join(columns)}) FROM STDIN"
+                ) as copy:
+                    for record in records:
+                        copy.write_row(record)
+                        n_rows += 1
+        return n_rows
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,195 @@
+import time
+import queue
+import sqlite3
+import threading
+import numpy as np
+from concurrent.futures import Future
+from openai import OpenAI
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalise the text used as a cache key: collapse whitespace and casefold.
+    """
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache stored in SQLite, keyed on the normalised text
+    and the model name. Embeddings are stored as float32 blobs. Entries expire
+    after `ttl` seconds and the least recently used entries are evicted when
+    the cache grows beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str = "embedding_cache.sqlite",
+        max_entries: int = 100_000,
+        ttl: float = 30 * 24 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, texts: list[str], model: str) -> dict[str, list]:
+        """
+        Look up the embeddings of the texts. Returns a mapping from the
+        normalised text to the embedding for the cache hits only.
+        """
+        keys = list({normalize_text(t) for t in texts})
+        if not keys:
+            return {}
+
+        now = time.time()
+        placeholders = ", ".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT text, embedding FROM embeddings
+                WHERE model = ? AND created > ? AND text IN ({placeholders})
+                """,
+                [model, now - self.ttl, *keys],
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                [(now, model, text) for text, _ in rows],
+            )
+            self._conn.commit()
+
+        return {
+            text: np.frombuffer(blob, dtype=np.float32).tolist() for text, blob in rows
+        }
+
+    def put_many(self, items: dict[str, list], model: str):
+        """
+        Store embeddings keyed on their (normalised) text.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        model,
+                        normalize_text(text),
+                        np.asarray(embedding, dtype=np.float32).tobytes(),
+                        now,
+                        now,
+                    )
+                    for text, embedding in items.items()
+                ],
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        """
+        Drop expired entries and the least recently used entries above the limit.
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE created <= ?", (time.time() - self.ttl,)
+            )
+            self._conn.execute(
+                """
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings
+                    ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+
+class EmbeddingService:
+    """
+    Embeds query texts through the persistent cache. Cache misses from
+    concurrent callers are collected for up to `max_wait` seconds and sent to
+    the OpenAI API as a single batched `embeddings.create` call.
+    """
+
+    def __init__(
+        self,
+        client: OpenAI,
+        cache: EmbeddingCache,
+        model: str = "text-embedding-3-small",
+        max_batch: int = 64,
+        max_wait: float = 0.01,
+    ):
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def embed(self, text: str) -> list:
+        """
+        Get the embedding of a single text.
+        """
+        text = text.replace("\n", " ")
+        cached = self.cache.get_many([text], self.model)
+        if cached:
+            return next(iter(cached.values()))
+
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect(self) -> list[tuple[str, Future]]:
+        """
+        Block for the first request, then gather more until the batch is full
+        or max_wait has passed.
+        """
+        requests = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(requests) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                requests.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            # Identical texts in the same batch are embedded only once
+            texts = list({normalize_text(text): text for text, _ in requests}.values())
+            try:
+                data = self.client.embeddings.create(input=texts, model=self.model).data
+                embeddings = {
+                    normalize_text(text): item.embedding
+                    for text, item in zip(texts, data)
+                }
+                self.cache.put_many(embeddings, self.model)
+                for text, future in requests:
+                    future.set_result(embeddings[normalize_text(text)])
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from lexical_index import LexicalIndex
+from vector_index import VectorIndex, normalize
+
+
+def reciprocal_rank_fusion(rankings: list[np.ndarray], n_docs: int, k: int = 60) -> np.ndarray:
+    """
+    Fuse rankings (arrays of document indices, best first) into RRF scores.
+    """
+    scores = np.zeros(n_docs, dtype=np.float32)
+    for ranking in rankings:
+        scores[ranking] += 1.0 / (k + np.arange(1, len(ranking) + 1))
+    return scores
+
+
+def weighted_fusion(scores: list[np.ndarray], weights: list[float]) -> np.ndarray:
+    """
+    Fuse score vectors by a weighted sum after min-max normalising each.
+    """
+    fused = np.zeros_like(scores[0], dtype=np.float32)
+    for s, w in zip(scores, weights):
+        spread = s.max() - s.min()
+        fused += w * ((s - s.min()) / spread if spread > 0 else np.zeros_like(s))
+    return fused
+
+
+def top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Indices of the n highest scores in descending order.
+    """
+    n = min(n, len(scores))
+    idx = np.argpartition(-scores, n - 1)[:n]
+    return idx[np.argsort(-scores[idx])]
+
+
+class HybridRetriever:
+    """
+    Hybrid lexical + dense retrieval over the courses of the in-process
+    vector index. The BM25 search and the dense search (query embedding plus
+    matmul) run in parallel and their rankings are fused, either by
+    reciprocal rank fusion or by a weighted sum of normalised scores.
+
+    Course codes in the query are answered instantly from the lexical index.
+    If the embedding does not arrive within `dense_timeout` seconds the
+    lexical results are served alone. With `shortlist` set, only the top
+    lexical candidates are re-scored with the exact dense similarity.
+    """
+
+    def __init__(
+        self,
+        vector_index: VectorIndex,
+        embed: Callable[[str], list],
+        fusion: str = "rrf",
+        lexical_weight: float = 0.3,
+        rrf_depth: int = 50,
+        dense_timeout: float = 2.0,
+        shortlist: int = None,
+    ):
+        if fusion not in ["rrf", "weighted"]:
+            raise ValueError(f"Unknown fusion '{fusion}'")
+        self.vector_index = vector_index
+        self.embed = embed
+        self.fusion = fusion
+        self.lexical_weight = lexical_weight
+        self.rrf_depth = rrf_depth
+        self.dense_timeout = dense_timeout
+        self.shortlist = shortlist
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self._lexical = None
+
+    def _lexical_index(self, courses: pd.DataFrame) -> LexicalIndex:
+        """
+        The lexical index over the same courses as the vector index snapshot.
+        """
+        lexical = self._lexical
+        if lexical is None or lexical.courses is not courses:
+            lexical = self._lexical = LexicalIndex(courses)
+        return lexical
+
+    def _result(self, courses: pd.DataFrame, idx: np.ndarray, scores: np.ndarray) -> pd.DataFrame:
+        result = courses.iloc[idx].reset_index(drop=True)
+        result["score"] = scores[idx]
+        return result
+
+    def search(self, query: str, n: int = 5) -> pd.DataFrame | None:
+        """
+        Get the top n courses for the query. Returns None if the vector index
+        has no fresh data, or if the embedding timed out and no course matches
+        the query lexically, in which case the caller should use another path.
+        """
+        snapshot = self.vector_index.snapshot()
+        if snapshot is None:
+            return None
+        matrix, courses = snapshot
+        lexical = self._lexical_index(courses)
+
+        # Exact course code lookups skip the embedding entirely
+        code_idx = lexical.lookup_codes(query)
+        if code_idx:
+            idx = np.array(code_idx[:n])
+            return self._result(courses, idx, np.ones(len(courses), dtype=np.float32))
+
+        embedding = self.executor.submit(self.embed, query)
+        lexical_scores = lexical.scores(query)
+
+        try:
+            query_vec = normalize(
+                np.asarray(embedding.result(timeout=self.dense_timeout), dtype=np.float32)
+            )
+        except TimeoutError:
+            # The embedding API is slow, serve the lexical results if any
+            if lexical_scores.max() <= 0:
+                return None
+            return self._result(courses, top_n(lexical_scores, n), lexical_scores)
+
+        if self.shortlist and lexical_scores.max() > 0:
+            # Exact dense re-scoring of the lexical candidates only
+            candidates = top_n(lexical_scores, max(self.shortlist, n))
+            dense_scores = np.full(len(courses), -np.inf, dtype=np.float32)
+            dense_scores[candidates] = matrix[candidates] @ query_vec
+            return self._result(courses, top_n(dense_scores, n), dense_scores)
+
+        dense_scores = matrix @ query_vec
+        if self.fusion == "rrf":
+            lexical_ranking = top_n(lexical_scores, self.rrf_depth)
+            lexical_ranking = lexical_ranking[lexical_scores[lexical_ranking] > 0]
+            scores = reciprocal_rank_fusion(
+                [top_n(dense_scores, self.rrf_depth), lexical_ranking], len(courses)
+            )
+        else:
+            scores = weighted_fusion(
+                [dense_scores, lexical_scores], [1 - self.lexical_weight, self.lexical_weight]
+            )
+        return self._result(courses, top_n(scores, n), scores)
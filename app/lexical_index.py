@@ -0,0 +1,81 @@
+import re
+import numpy as np
+import pandas as pd
+from collections import Counter, defaultdict
+
+WORD = re.compile(r"\w+")
+COURSE_CODE = re.compile(r"\b[A-Z]{2,5}-[A-Z]{0,2}\d{3,6}\b", re.IGNORECASE)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "course", "courses",
+    "for", "from", "how", "i", "in", "is", "it", "learn", "me", "of", "on", "or",
+    "show", "that", "the", "to", "want", "what", "which", "with", "you",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercase word tokens without stopwords and single characters.
+    """
+    return [
+        w for w in WORD.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    """
+    BM25 index over the course names and descriptions, stored as an inverted
+    index of posting lists. A query only touches the postings of its own terms.
+    Also resolves exact course code lookups.
+    """
+
+    def __init__(self, courses: pd.DataFrame, k1: float = 1.5, b: float = 0.75):
+        self.courses = courses
+        self.k1 = k1
+        self.b = b
+
+        texts = (courses["name"].fillna("") + " " + courses["description"].fillna("")).to_list()
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        postings = defaultdict(lambda: ([], []))
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf)
+
+        self.doc_lengths = doc_lengths
+        avg_length = doc_lengths.mean() if len(doc_lengths) else 0.0
+        self.length_norm = k1 * (1 - b + b * doc_lengths / max(avg_length, 1e-9))
+
+        n_docs = len(texts)
+        self.postings = {}
+        for term, (doc_ids, tfs) in postings.items():
+            idf = np.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self.postings[term] = (
+                np.array(doc_ids, dtype=np.int32),
+                np.array(tfs, dtype=np.float32),
+                idf,
+            )
+
+        self.code_to_idx = {
+            code.upper(): idx for idx, code in enumerate(courses["code"])
+        }
+
+    def lookup_codes(self, query: str) -> list[int]:
+        """
+        Indices of the courses whose codes appear in the query.
+        """
+        matches = [m.upper() for m in COURSE_CODE.findall(query)]
+        return [self.code_to_idx[m] for m in matches if m in self.code_to_idx]
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        BM25 scores of all courses for the query.
+        """
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            doc_ids, tfs, idf = self.postings[term]
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + self.length_norm[doc_ids])
+        return scores
@@ -0,0 +1,101 @@
+"""
+Load test for the DBConnection pool against a stand-in Postgres with pgvector,
+for example:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres pgvector/pgvector:pg16
+    DB_USER=postgres DB_PASSWORD=postgres DB_HOST=localhost DB_PORT=5432 \\
+        DB_NAME=postgres python load_test.py --sessions 20 --pool-size 5
+
+Simulates concurrent chat sessions issuing top-n queries and reports the
+p50/p99 latency together with the pool statistics.
+"""
+import os
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from db_connection import DBConnection
+
+TABLE_NAME = "load_test_course_embeddings"
+DIM = 1536
+
+
+def seed_table(db: DBConnection, n_courses: int = 800):
+    """
+    Create a course table with random embeddings.
+    """
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_courses, DIM)).astype(np.float32)
+    with db.engine.begin() as connection:
+        cursor = connection.connection.driver_connection.cursor()
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {TABLE_NAME} (
+                code text PRIMARY KEY,
+                name text,
+                credits text,
+                description text,
+                url text,
+                embedding_openai vector({DIM})
+            )
+            """
+        )
+        cursor.executemany(
+            f"INSERT INTO {TABLE_NAME} VALUES (%s, %s, %s, %s, %s, %b)",
+            [
+                (f"TEST-{i}", f"Course {i}", "5", "Description", "URL", emb)
+                for i, emb in enumerate(embeddings)
+            ],
+        )
+
+
+def session(db: DBConnection, n_queries: int, seed: int) -> list[float]:
+    """
+    A single chat session issuing queries back to back.
+    Returns the latencies in milliseconds.
+    """
+    rng = np.random.default_rng(seed)
+    latencies = []
+    for _ in range(n_queries):
+        embedding = rng.standard_normal(DIM).astype(np.float32)
+        start = time.perf_counter()
+        db.top_n_by_embedding(embedding, 5, table_name=TABLE_NAME)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=10)
+    args = parser.parse_args()
+
+    db = DBConnection(
+        os.environ.get("DB_USER"),
+        os.environ.get("DB_PASSWORD"),
+        os.environ.get("DB_HOST"),
+        os.environ.get("DB_PORT"),
+        os.environ.get("DB_NAME"),
+        pool_size=args.pool_size,
+        max_overflow=args.max_overflow,
+    )
+    seed_table(db)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        results = executor.map(
+            lambda seed: session(db, args.queries, seed), range(args.sessions)
+        )
+        latencies = np.concatenate([np.array(r) for r in results])
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(latencies)} queries in {elapsed:.2f} s ({len(latencies) / elapsed:.0f} q/s)")
+    print(f"p50 {np.percentile(latencies, 50):.2f} ms")
+    print(f"p99 {np.percentile(latencies, 99):.2f} ms")
+    print(f"pool {db.pool_stats()}")
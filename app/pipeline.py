@@ -0,0 +1,184 @@
+import re
+import asyncio
+import itertools
+import logging
+import pandas as pd
+from typing import Generator
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
+
+from app_utils import (
+    semantic_cache,
+    get_embedding,
+    get_top_n_courses,
+    create_query,
+    infer_best_course,
+    format_reponses_json,
+)
+
+# Long-lived executor for the blocking stages. Unlike the default executor,
+# asyncio.run() does not wait for it on exit, so a stage that times out no
+# longer holds up the response while its thread finishes in the background.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-pipeline")
+
+RETRIEVAL_ERROR = "Sorry, the course search is not available right now. Please try again later."
+
+
+async def _run_stage(func, *args, timeout: float):
+    """
+    Run a blocking function on the pipeline executor with a timeout.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_executor, func, *args), timeout)
+
+
+def _same_query(a: str, b: str) -> bool:
+    """
+    Whether two queries are equal up to case, punctuation and whitespace.
+    """
+    normalize = lambda s: " ".join(re.sub(r"[^\w\s]", " ", s).split()).casefold()
+    return normalize(a) == normalize(b)
+
+
+def _start_answer_stream(
+    llm_client: OpenAI, prompt: str, courses: pd.DataFrame, opened: dict
+) -> Generator[str, None, None]:
+    """
+    Start streaming the LLM answer and wait for the first token, so that a
+    timeout around this call bounds the time to first token. The stream is
+    put in `opened` so that the caller can close it if the timeout fires.
+    """
+    stream = infer_best_course(
+        llm_client, prompt, format_reponses_json(courses), stream=True
+    )
+    opened["stream"] = stream
+    if opened.get("abandoned"):
+        stream.close()
+    first = next(stream, "")
+    return itertools.chain([first], stream)
+
+
+def _cache_answer(
+    stream: Generator[str, None, None], embedding: list
+) -> Generator[str, None, None]:
+    """
+    Pass the answer tokens through and store the full answer in the semantic
+    cache once the stream has completed.
+    """
+    tokens = []
+    for token in stream:
+        tokens.append(token)
+        yield token
+    semantic_cache.store(embedding, answer="".join(tokens))
+
+
+async def llm_pipeline(
+    llm_client: OpenAI,
+    prompt: str,
+    n: int = 5,
+    rewrite_timeout: float = 5,
+    retrieval_timeout: float = 5,
+    first_token_timeout: float = 10,
+    cache_answers: bool = True,
+) -> tuple[pd.DataFrame, Generator[str, None, None] | None]:
+    """
+    Retrieval pipeline for the LLM mode. Retrieval for the raw prompt starts
+    speculatively while the LLM rewrites the query, and its result is reused
+    if the rewritten query matches the prompt or if the rewrite or the second
+    retrieval fails or times out. With `cache_answers=True` the LLM answers are
+    stored in the semantic cache and reused for near-identical prompts.
+
+    The stages run on a shared executor and the OpenAI requests carry the
+    stage timeouts, so a stage that times out does not delay the response.
+
+    Returns:
+        tuple[pd.DataFrame, Generator | None]: The retrieved courses and a token
+        stream of the LLM answer. The stream is None if the answer could not be
+        started, in which case the caller should fall back to the non-LLM response.
+        If the retrieval fails altogether, no courses and an error message are
+        returned.
+    """
+    speculative = asyncio.create_task(
+        _run_stage(get_top_n_courses, prompt, n, timeout=retrieval_timeout)
+    )
+
+    try:
+        # The request timeout ends the abandoned thread soon after a timeout
+        rewrite_client = llm_client.with_options(timeout=rewrite_timeout, max_retries=0)
+        improved_query = await _run_stage(
+            create_query, rewrite_client, prompt, timeout=rewrite_timeout
+        )
+    except Exception as e:
+        logging.warning(f"Query rewrite failed, using the raw prompt: {e}")
+        improved_query = prompt
+
+    courses = None
+    if not _same_query(improved_query, prompt):
+        try:
+            courses = await _run_stage(
+                get_top_n_courses, improved_query, n, timeout=retrieval_timeout
+            )
+        except Exception as e:
+            logging.warning(f"Retrieval for the rewritten query failed: {e}")
+
+    if courses is None:
+        try:
+            courses = await speculative
+        except Exception as e:
+            # E.g. a cold start, retry once without the stage timeout
+            logging.warning(f"Retrieval for the raw prompt failed, retrying: {e}")
+            try:
+                loop = asyncio.get_running_loop()
+                courses = await loop.run_in_executor(
+                    _executor, get_top_n_courses, prompt, n
+                )
+            except Exception as e:
+                logging.error(f"Retrieval failed: {e}")
+                return pd.DataFrame(), iter([RETRIEVAL_ERROR])
+    else:
+        speculative.cancel()
+
+    if cache_answers:
+        try:
+            embedding = await _run_stage(get_embedding, prompt, timeout=retrieval_timeout)
+        except Exception as e:
+            logging.warning(f"Prompt embedding failed, skipping the answer cache: {e}")
+            cache_answers = False
+
+    if cache_answers:
+        answer = semantic_cache.lookup_answer(embedding)
+        logging.info(f"Semantic cache {semantic_cache.stats()}")
+        if answer is not None:
+            return courses, iter([answer])
+
+    opened = {}
+    try:
+        answer_client = llm_client.with_options(
+            timeout=first_token_timeout, max_retries=0
+        )
+        answer = await _run_stage(
+            _start_answer_stream,
+            answer_client,
+            prompt,
+            courses,
+            opened,
+            timeout=first_token_timeout,
+        )
+    except Exception as e:
+        logging.warning(f"LLM answer failed, falling back to plain results: {e}")
+        # Close the abandoned stream so its thread stops waiting for tokens
+        opened["abandoned"] = True
+        if "stream" in opened:
+            opened["stream"].close()
+        return courses, None
+
+    if cache_answers:
+        answer = _cache_answer(answer, embedding)
+    return courses, answer
+
+
+def run_llm_pipeline(llm_client: OpenAI, prompt: str, **kwargs):
+    """
+    Run the LLM pipeline from synchronous code.
+    """
+    return asyncio.run(llm_pipeline(llm_client, prompt, **kwargs))
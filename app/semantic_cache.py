@@ -0,0 +1,124 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+
+class SemanticCache:
+    """
+    Cache of retrieval results keyed by query-embedding similarity. A query
+    hits the cache if a previous query embedding has a cosine similarity of at
+    least `threshold` with it, so that near-identical queries such as
+    "learn NLP" and "learn nlp courses" share one entry. Entries can also hold
+    the LLM answer for the query.
+
+    The cache holds at most `max_entries` entries in a preallocated float32
+    matrix. Entries expire after `ttl` seconds and the least recently used
+    entry is evicted when the cache is full.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        threshold: float = 0.95,
+        max_entries: int = 2048,
+        ttl: float = 3600,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._embeddings = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries = [None] * max_entries
+        self._last_used = np.full(max_entries, -np.inf)
+        # Retrieval results and LLM answers are counted separately
+        self.hits = {"courses": 0, "answer": 0}
+        self.misses = {"courses": 0, "answer": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / max(np.linalg.norm(embedding), 1e-12)
+
+    def _find(self, embedding: np.ndarray) -> int | None:
+        """
+        Slot of the most similar live entry above the threshold.
+        """
+        scores = self._embeddings @ embedding
+        slot = int(np.argmax(scores))
+        entry = self._entries[slot]
+        if entry is None or scores[slot] < self.threshold:
+            return None
+        if time.monotonic() - entry["created"] > self.ttl:
+            self._entries[slot] = None
+            self._embeddings[slot] = 0
+            self._last_used[slot] = -np.inf
+            return None
+        return slot
+
+    def lookup(self, embedding, n: int) -> pd.DataFrame | None:
+        """
+        Get the cached top n courses for a similar query, or None on a miss.
+        """
+        embedding = self._normalize(embedding)
+        with self._lock:
+            slot = self._find(embedding)
+            entry = self._entries[slot] if slot is not None else None
+            if entry is None or entry["courses"] is None or len(entry["courses"]) < n:
+                self.misses["courses"] += 1
+                return None
+            self.hits["courses"] += 1
+            self._last_used[slot] = time.monotonic()
+            return entry["courses"].head(n).copy()
+
+    def lookup_answer(self, embedding) -> str | None:
+        """
+        Get the cached LLM answer for a similar query, or None on a miss.
+        """
+        embedding = self._normalize(embedding)
+        with self._lock:
+            slot = self._find(embedding)
+            if slot is None or self._entries[slot]["answer"] is None:
+                self.misses["answer"] += 1
+                return None
+            self.hits["answer"] += 1
+            self._last_used[slot] = time.monotonic()
+            return self._entries[slot]["answer"]
+
+    def store(self, embedding, courses: pd.DataFrame = None, answer: str = None):
+        """
+        Store the courses and/or the LLM answer for a query. An existing entry
+        for a similar query is updated in place, otherwise the least recently
+        used slot is taken.
+        """
+        embedding = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            slot = self._find(embedding)
+            if slot is None:
+                slot = int(np.argmin(self._last_used))
+                self._entries[slot] = {"courses": None, "answer": None, "created": now}
+                self._embeddings[slot] = embedding
+
+            entry = self._entries[slot]
+            if courses is not None:
+                entry["courses"] = courses.copy()
+            if answer is not None:
+                entry["answer"] = answer
+            self._last_used[slot] = now
+
+    def stats(self) -> dict:
+        """
+        Hits, misses and hit rate of the course and the answer lookups, and
+        the size of the cache.
+        """
+        with self._lock:
+            stats = {"size": sum(entry is not None for entry in self._entries)}
+            for kind in ["courses", "answer"]:
+                lookups = self.hits[kind] + self.misses[kind]
+                stats[kind] = {
+                    "hits": self.hits[kind],
+                    "misses": self.misses[kind],
+                    "hit_rate": self.hits[kind] / lookups if lookups else 0.0,
+                }
+            return stats
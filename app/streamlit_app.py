@@ -1,16 +1,16 @@
+import time
 import streamlit as st
 from openai import OpenAI
 
 from app_utils import (
+    semantic_cache,
     init_connection_sqlalchemy,
     init_connection_openai,
     get_top_n_courses,
-    create_query,
-    infer_best_course,
     response_streamer,
     format_response,
-    format_reponses_json,
 )
+from pipeline import run_llm_pipeline
 
 supabase = init_connection_sqlalchemy()
 client = init_connection_openai()
@@ -40,6 +40,12 @@ if st.button("Clear conversation"):
 
 with st.sidebar:
     st.metric("Courses in database", 811, delta="12 %")
+    cache_stats = semantic_cache.stats()
+    st.caption(
+        f"Semantic cache: {cache_stats['size']} entries, "
+        f"{cache_stats['courses']['hit_rate']:.0%} result hit rate, "
+        f"{cache_stats['answer']['hit_rate']:.0%} answer hit rate"
+    )
     st.divider()
 
     # Toggle LLM
@@ -59,6 +65,10 @@ with st.chat_message("assistant"):
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Time to first token and total time of each response
+if "response_times" not in st.session_state:
+    st.session_state.response_times = []
+
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -66,6 +76,7 @@ for message in st.session_state.messages:
 
 # React to user input
 if prompt := st.chat_input("I want to learn about natural language processing."):
+    start = time.perf_counter()
 
     # Display user message in chat message container
     with st.chat_message("user"):
@@ -82,11 +93,14 @@ if prompt := st.chat_input("I want to learn about natural language processing.")
         elif llm and openai_api_key != "":
             # LLM: Format the response
             llm_client = OpenAI(api_key=openai_api_key)
-            improved_query = create_query(llm_client, prompt)
-            courses = get_top_n_courses(improved_query)
-            courses_json = format_reponses_json(courses)
-            courses_string = infer_best_course(llm_client, prompt, courses_json)
-            response = f"{courses_string}"
+            courses, answer_stream = run_llm_pipeline(llm_client, prompt)
+            if answer_stream is not None:
+                # Tokens are rendered as they arrive from the API
+                response = answer_stream
+            else:
+                # Fall back to the non-LLM response
+                courses_string = format_response(courses)
+                response = f"Here are some course recommendations: \n\n {courses_string}"
 
         else:
             # NO-LLM: Format the response
@@ -95,5 +109,7 @@ if prompt := st.chat_input("I want to learn about natural language processing.")
             response = f"Here are some course recommendations: \n\n {courses_string}"
 
         with st.chat_message("assistant"):
-            response = st.write_stream(response_streamer(response))
+            response = st.write_stream(
+                response_streamer(response, start, st.session_state.response_times)
+            )
             st.session_state.messages.append({"role": "assistant", "content": response})
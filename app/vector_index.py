@@ -0,0 +1,159 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+from db_connection import DBConnection, COURSE_COLUMNS
+
+
+def parse_vector(value) -> np.ndarray:
+    """
+    Parse a pgvector value into a float32 numpy array. Connections with the
+    pgvector types registered return numpy arrays, plain connections return
+    the text format, e.g. '[0.1,0.2,...]'.
+    """
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalise the rows of a matrix (or a single vector).
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    In-process copy of the course embeddings for answering top-n cosine
+    similarity queries without a database round trip. The embeddings are kept
+    as a contiguous, L2-normalised float32 matrix so that a query is a single
+    matrix-vector product followed by a partial sort.
+
+    The index polls the table statistics every `refresh_interval` seconds and
+    reloads itself when rows have been inserted, updated or deleted. If the
+    local copy is missing or has not been validated within `max_staleness`
+    seconds, `search` returns None and the caller should fall back to pgvector.
+    """
+
+    def __init__(
+        self,
+        db: DBConnection,
+        table_name: str = "course_embeddings",
+        column: str = "embedding_openai",
+        refresh_interval: float = 60,
+        max_staleness: float = 600,
+    ):
+        self.db = db
+        self.table_name = table_name
+        self.column = column
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        # (embedding matrix, course metadata) swapped atomically on reload
+        self._data = None
+        self._version = None
+        self._last_checked = 0.0
+        self._last_validated = 0.0
+
+    def _table_version(self) -> int:
+        """
+        Cheap change counter for the table based on the Postgres statistics
+        collector. Any insert, update or delete bumps the value.
+        """
+        df = self.db.query(
+            f"""
+            SELECT n_tup_ins + n_tup_upd + n_tup_del AS version
+            FROM pg_stat_user_tables
+            WHERE relname = '{self.table_name}'
+            """
+        )
+        return int(df["version"].iloc[0]) if len(df) else 0
+
+    def _load(self):
+        """
+        Load the embeddings and course metadata from the database.
+        """
+        cols = ", ".join(COURSE_COLUMNS)
+        df = self.db.query_params(
+            f"""
+            SELECT {cols}, {self.column}
+            FROM {self.table_name}
+            WHERE {self.column} IS NOT NULL
+            """,
+            prepare=False,
+        )
+        if df.empty:
+            return None
+
+        matrix = np.vstack([parse_vector(v) for v in df[self.column]])
+        matrix = np.ascontiguousarray(normalize(matrix), dtype=np.float32)
+        courses = df[COURSE_COLUMNS].reset_index(drop=True)
+        return matrix, courses
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the index if the table has changed since the last load.
+        Returns True if the index holds usable data afterwards.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_checked < self.refresh_interval:
+            return self._data is not None
+
+        # Only one thread polls the database; others keep serving the old copy
+        if not self._lock.acquire(blocking=self._data is None):
+            return self._data is not None
+        try:
+            self._last_checked = now
+            version = self._table_version()
+            if force or self._data is None or version != self._version:
+                self._data = self._load()
+                self._version = version
+            self._last_validated = now
+        except Exception as e:
+            print(f"Failed to refresh the vector index: {e}")
+        finally:
+            self._lock.release()
+
+        return self._data is not None
+
+    def is_fresh(self) -> bool:
+        """
+        Whether the local copy exists and was validated recently enough.
+        """
+        return (
+            self._data is not None
+            and time.monotonic() - self._last_validated <= self.max_staleness
+        )
+
+    def snapshot(self) -> tuple[np.ndarray, pd.DataFrame] | None:
+        """
+        The current (embedding matrix, courses) pair, or None if the local copy
+        is stale or missing. The pair is replaced, never mutated, on reload.
+        """
+        self.refresh()
+        return self._data if self.is_fresh() else None
+
+    def search(self, embedding: list, n: int = 5) -> pd.DataFrame | None:
+        """
+        Get the top n courses by cosine similarity. Returns None if the local
+        copy is stale or missing.
+        """
+        self.refresh()
+        if not self.is_fresh():
+            return None
+
+        matrix, courses = self._data
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        scores = matrix @ query
+
+        n = min(n, len(scores))
+        top_n_idx = np.argpartition(-scores, n - 1)[:n]
+        top_n_idx = top_n_idx[np.argsort(-scores[top_n_idx])]
+
+        result = courses.iloc[top_n_idx].reset_index(drop=True)
+        result["similarity"] = scores[top_n_idx]
+        return result
@@ -1,45 +1,123 @@
 import os
+import time
+import hashlib
+import numpy as np
 import pandas as pd
+from itertools import islice
+from typing import Callable, Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from supabase import create_client, Client
 
+from db_connection import DBConnection
+
+
+def batched(iterable: Iterable, batch_size: int) -> Generator[list, None, None]:
+    """
+    Yield lists of at most batch_size items from the iterable.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def course_hash(description: str, model_names: Iterable[str]) -> str:
+    """
+    Fingerprint of a course description and the embedding models used for it.
+    Changing either the text or any model invalidates the stored embeddings.
+    """
+    description = "" if pd.isna(description) else str(description)
+    key = description + "\x00" + ",".join(sorted(model_names))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
 
 class VectorDB:
 
-    def __init__(self):
+    def __init__(self, db: DBConnection = None):
         self.url = os.environ.get("SUPABASE_URL")
         self.key = os.environ.get("SUPABASE_KEY")
         self.supabase = create_client(self.url, self.key)
+        # Direct Postgres connection, only needed for COPY based loading
+        self.db = db
 
-    def _load_courses_embeddings(
+    @staticmethod
+    def _embedding_lookup(emb: pd.DataFrame) -> tuple[dict, np.ndarray]:
+        """
+        Pack an embedding frame into a contiguous float32 matrix and a
+        course_code -> row position mapping. The matrix is filled row by row
+        so no float64 intermediate copy of the whole frame is made.
+        """
+        values = emb["embedding"]
+        dim = len(values.iloc[0]) if len(values) else 0
+        matrix = np.empty((len(values), dim), dtype=np.float32)
+        for i, value in enumerate(values):
+            matrix[i] = value
+        positions = {code: i for i, code in enumerate(emb["course_code"])}
+        return positions, matrix
+
+    def _iter_course_batches(
         self,
         courses: pd.DataFrame,
-        embeddings: list[pd.DataFrame],
-    ):
+        embeddings: dict[str, pd.DataFrame],
+        batch_size: int = 100,
+    ) -> Generator[list[dict], None, None]:
         """
-        Returns a generator of dictionaries from a pandas DataFrame
+        Stream the courses joined with their embeddings as batches of records.
+        The join is done on course_code through per-model lookup tables, so
+        memory does not grow with the number of embedding columns beyond the
+        float32 matrices themselves. Courses missing any embedding are skipped.
         """
         # Only specific columns are needed
         cols = ["course_code", "course_name", "credits", "course_description_en", "url"]
+        if "content_hash" in courses.columns:
+            cols.append("content_hash")
+
+        # Rename the columns to match the database schema
+        names = {
+            "course_code": "code",
+            "course_name": "name",
+            "course_description_en": "description",
+        }
+        keys = [names.get(col, col) for col in cols]
         courses = courses[cols]
 
-        # Join the embeddings to the courses
-        for name, emb in embeddings.items():
-            # Rename the embedding for identification
-            emb = emb.rename(columns={"embedding": name})
-            courses = courses.merge(emb, how="inner", on="course_code")
+        lookups = {
+            name: self._embedding_lookup(emb) for name, emb in embeddings.items()
+        }
 
-        # Rename the columns to match the database schema
-        courses = courses.rename(
-            columns={
-                "course_code": "code",
-                "course_name": "name",
-                "course_description_en": "description",
-            }
-        )
+        for start in range(0, len(courses), batch_size):
+            chunk = courses.iloc[start : start + batch_size]
+            batch = []
+            for row in chunk.itertuples(index=False, name=None):
+                code = row[0]
+                if not all(code in positions for positions, _ in lookups.values()):
+                    continue
+                record = dict(zip(keys, row))
+                for name, (positions, matrix) in lookups.items():
+                    record[name] = matrix[positions[code]]
+                batch.append(record)
+            if batch:
+                yield batch
+
+    def _load_courses_embeddings(
+        self,
+        courses: pd.DataFrame,
+        embeddings: dict[str, pd.DataFrame],
+    ):
+        """
+        Returns a generator of dictionaries from a pandas DataFrame
+        """
+        for batch in self._iter_course_batches(courses, embeddings):
+            yield from batch
 
-        # The rows are fed to the database one by one
-        for row in courses.to_dict(orient="records"):
-            yield row
+    @staticmethod
+    def _to_json(record: dict) -> dict:
+        """
+        Convert the float32 embeddings of a record to lists for the REST API.
+        """
+        return {
+            key: value.tolist() if isinstance(value, np.ndarray) else value
+            for key, value in record.items()
+        }
 
     def insert_courses(
         self,
@@ -52,7 +130,225 @@ class VectorDB:
         """
         data = self._load_courses_embeddings(courses, embeddings)
         for record in data:
-            self.supabase.table(table_name).insert(record).execute()
+            self.supabase.table(table_name).insert(self._to_json(record)).execute()
+
+    def _write_batch(
+        self,
+        batch: list[dict],
+        table_name: str,
+        upsert: bool,
+        max_retries: int,
+    ) -> int:
+        """
+        Write a single batch, retrying with exponential backoff.
+        Returns the number of rows written.
+        """
+        batch = [self._to_json(record) for record in batch]
+        for attempt in range(max_retries + 1):
+            try:
+                table = self.supabase.table(table_name)
+                if upsert:
+                    table.upsert(batch, on_conflict="code").execute()
+                else:
+                    table.insert(batch).execute()
+                return len(batch)
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                print(f"Batch failed ({e}), retrying {attempt + 1}/{max_retries}")
+                time.sleep(2**attempt)
+
+    def bulk_insert_courses(
+        self,
+        courses: pd.DataFrame,
+        embeddings: dict[str, pd.DataFrame],
+        table_name: str,
+        batch_size: int = 100,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        upsert: bool = False,
+    ) -> dict:
+        """
+        Insert or upsert the courses in batches, with at most max_workers
+        batches in flight at a time. Failed batches are retried max_retries
+        times before giving up.
+
+        Returns:
+            dict: Number of rows written, failed batches and rows per second.
+        """
+        batches = self._iter_course_batches(courses, embeddings, batch_size)
+
+        start = time.perf_counter()
+        n_rows, failed = 0, []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+            for batch in batches:
+                # Bound the number of pending batches held in memory
+                if len(in_flight) >= max_workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        n_rows += self._collect(future, in_flight, failed)
+
+                future = executor.submit(
+                    self._write_batch, batch, table_name, upsert, max_retries
+                )
+                in_flight[future] = batch
+
+            for future in list(in_flight):
+                n_rows += self._collect(future, in_flight, failed)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": n_rows,
+            "failed_batches": len(failed),
+            "rows_per_second": n_rows / elapsed if elapsed > 0 else 0.0,
+        }
+        print(
+            f"Inserted {n_rows} rows in {elapsed:.1f} s "
+            f"({stats['rows_per_second']:.0f} rows/s), {len(failed)} failed batches"
+        )
+        return stats
+
+    @staticmethod
+    def _collect(future, in_flight: dict, failed: list) -> int:
+        """
+        Pop a finished batch and return the number of rows it wrote.
+        """
+        batch = in_flight.pop(future)
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Giving up on batch starting at {batch[0]['code']}: {e}")
+            failed.append(batch)
+            return 0
+
+    def copy_courses(
+        self,
+        courses: pd.DataFrame,
+        embeddings: dict[str, pd.DataFrame],
+        table_name: str,
+        truncate: bool = True,
+    ) -> dict:
+        """
+        Load the courses with Postgres COPY through the direct database
+        connection. Much faster than the REST API for full reloads.
+        """
+        assert self.db is not None, "COPY requires a DBConnection."
+        data = self._load_courses_embeddings(courses, embeddings)
+        first = next(data, None)
+        if first is None:
+            return {"rows": 0, "rows_per_second": 0.0}
+
+        columns = list(first.keys())
+        vector_columns = set(embeddings.keys())
+
+        def to_row(record):
+            return tuple(
+                np.asarray(record[col], dtype=np.float32)
+                if col in vector_columns
+                else record[col]
+                for col in columns
+            )
+
+        def rows():
+            yield to_row(first)
+            for record in data:
+                yield to_row(record)
+
+        start = time.perf_counter()
+        n_rows = self.db.copy_records(table_name, columns, rows(), truncate=truncate)
+        elapsed = time.perf_counter() - start
+
+        stats = {"rows": n_rows, "rows_per_second": n_rows / elapsed}
+        print(f"Copied {n_rows} rows in {elapsed:.1f} s ({stats['rows_per_second']:.0f} rows/s)")
+        return stats
+
+    def _stored_hashes(self, table_name: str, page_size: int = 1000) -> dict[str, str]:
+        """
+        Fetch the content hash of every stored course, page by page. The rows
+        are ordered by code so that the pages do not overlap or skip rows.
+        """
+        hashes, offset = {}, 0
+        while True:
+            rows = (
+                self.supabase.table(table_name)
+                .select("code, content_hash")
+                .order("code")
+                .range(offset, offset + page_size - 1)
+                .execute()
+                .data
+            )
+            hashes.update({row["code"]: row["content_hash"] for row in rows})
+            if len(rows) < page_size:
+                return hashes
+            offset += page_size
+
+    def sync_courses(
+        self,
+        courses: pd.DataFrame,
+        embedders: dict[str, tuple[str, Callable[[list[str]], list]]],
+        table_name: str,
+        batch_size: int = 100,
+    ) -> dict:
+        """
+        Incrementally sync the course table. Each course is fingerprinted by
+        its English description and the embedding model names, and only new or
+        changed courses are embedded and upserted. Courses that no longer exist
+        are deleted. Requires a `content_hash` text column in the table.
+
+        Args:
+            courses (pd.DataFrame): The full, current course catalogue.
+            embedders (dict): Maps each embedding column to a (model name,
+            embedding function) tuple. The function takes a list of descriptions
+            and returns a list of embeddings.
+            table_name (str): Name of the course table.
+
+        Returns:
+            dict: Number of upserted, deleted and unchanged courses, and the
+            number of batches that could not be written. Courses in failed
+            batches keep their old hash and are retried on the next sync.
+        """
+        model_names = [f"{col}={model}" for col, (model, _) in embedders.items()]
+        courses = courses.drop_duplicates("course_code").copy()
+        courses["content_hash"] = [
+            course_hash(desc, model_names) for desc in courses["course_description_en"]
+        ]
+
+        stored = self._stored_hashes(table_name)
+        is_changed = [
+            stored.get(code) != digest
+            for code, digest in zip(courses["course_code"], courses["content_hash"])
+        ]
+        changed = courses[is_changed]
+        deleted = list(set(stored) - set(courses["course_code"]))
+        print(
+            f"{len(changed)} new or changed, {len(deleted)} deleted, "
+            f"{len(courses) - len(changed)} unchanged courses"
+        )
+
+        stats = {"rows": 0, "failed_batches": 0}
+        if len(changed):
+            # Only the changed descriptions are sent to the embedding models
+            texts = changed["course_description_en"].fillna("").to_list()
+            embeddings = {
+                col: pd.DataFrame(
+                    {"course_code": changed["course_code"].to_list(), "embedding": embed(texts)}
+                )
+                for col, (_, embed) in embedders.items()
+            }
+            stats = self.bulk_insert_courses(
+                changed, embeddings, table_name, batch_size=batch_size, upsert=True
+            )
+
+        for batch in batched(deleted, batch_size):
+            self.supabase.table(table_name).delete().in_("code", batch).execute()
+
+        return {
+            "upserted": stats["rows"],
+            "deleted": len(deleted),
+            "unchanged": len(courses) - len(changed),
+            "failed_batches": stats["failed_batches"],
+        }
 
 
 if __name__ == "__main__":
@@ -62,8 +358,6 @@ if __name__ == "__main__":
     emb_bert = pd.read_pickle("embeddings_pretranslated_all-distilroberta-v1.pkl")
     emb_oai = pd.read_pickle("embeddings_pretranslated_openai-small.pkl")
     emb_oai_mixed = pd.read_pickle("embeddings_notranslated_openai-small.pkl")
-    emb_bert.embedding = emb_bert.embedding.apply(lambda x: x.tolist())
-    emb_oai.embedding = emb_oai.embedding.apply(lambda x: x.tolist())
 
     embeddings = {
         "embedding_bert": emb_bert,
@@ -75,4 +369,4 @@ if __name__ == "__main__":
     vectordb = VectorDB()
 
     # Insert the courses into the database
-    vectordb.insert_courses(courses, embeddings, "course_embeddings")
+    vectordb.bulk_insert_courses(courses, embeddings, "course_embeddings")
@@ -0,0 +1,4 @@
+# Puts the repository root on sys.path so tests can import e.g. scraper.http_fetch
+
+# A load-testing script, not a test module
+collect_ignore = ["app/load_test.py"]
@@ -7,6 +7,43 @@ from nltk.stem.snowball import SnowballStemmer
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 
+class TokenAnalyzer:
+    """
+    Tokenises, filters stopwords and stems a text in a single pass, producing
+    the same terms as TFIDF.preprocess followed by the default TfidfVectorizer
+    analyzer. Meant to be plugged into TfidfVectorizer as the analyzer. Stems
+    are memoised in a bounded cache, since the vocabulary is small and very
+    repetitive.
+    """
+
+    def __init__(self, stop_words: set, cache_size: int = 100_000):
+        self.stop_words = stop_words
+        self.cache_size = cache_size
+        self.stemmer = SnowballStemmer("english")
+        self.cache = {}
+
+    def __call__(self, text: str) -> list[str]:
+        terms = []
+        for word in word_tokenize(text):
+            if word in self.stop_words or not word.isalnum():
+                continue
+            stem = self.cache.get(word)
+            if stem is None:
+                stem = self.stemmer.stem(word)
+                if len(self.cache) < self.cache_size:
+                    self.cache[word] = stem
+            # The default token pattern drops single character terms
+            if len(stem) > 1:
+                terms.append(stem)
+        return terms
+
+    def __getstate__(self):
+        # The stem cache is not worth pickling with the vectorizer
+        state = self.__dict__.copy()
+        state["cache"] = {}
+        return state
+
+
 # Copied from the /preprocessing/tfidf.py file
 class TFIDF:
 
@@ -14,6 +51,7 @@ class TFIDF:
         self.vectorizer = TfidfVectorizer()
         self.stemmer = SnowballStemmer("english")
         self._prepare_stopwords()
+        self.analyzer = TokenAnalyzer(self.stop_words)
 
     def _prepare_stopwords(self) -> str:
         self.stop_words = set(stopwords.words("english"))
@@ -50,5 +88,12 @@ class TFIDF:
         X = self.vectorizer.fit_transform(df[colname].apply(" ".join))
         return X
 
+    def fit_transform_text(self, df: pd.DataFrame, colname: str):
+        """Fit the vectorizer on the raw text column using the fused analyzer,
+        without materialising a tokens column."""
+        self.vectorizer = TfidfVectorizer(analyzer=self.analyzer)
+        X = self.vectorizer.fit_transform(df[colname].fillna(""))
+        return X
+
     def get_vectorizer(self) -> TfidfVectorizer:
         return self.vectorizer
@@ -2,10 +2,22 @@ import json
 import pickle
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from openai import OpenAI
 from sentence_transformers import SentenceTransformer
 from sklearn.feature_extraction.text import TfidfVectorizer
-from eval_util import TFIDF
+from eval_util import TFIDF, TokenAnalyzer
+from query_store import QueryEmbeddingStore
+
+
+class _VectorizerUnpickler(pickle.Unpickler):
+    """Vectorizers fitted in /preprocessing reference its tfidf module,
+    which is mirrored by eval_util."""
+
+    def find_class(self, module, name):
+        if module == "tfidf":
+            module = "eval_util"
+        return super().find_class(module, name)
 
 
 class IREvaluator:
@@ -13,10 +25,17 @@ class IREvaluator:
     to evaluate the performance of course embeddings on an evaluation set using the Normalized
     Discounted Cumulative Gain (NDCG) metric. The class supports evaluation of OpenAI embeddings,
     TF-IDF embeddings, and SentenceTransformer embeddings.
+
+    Query embeddings can be kept in a persistent QueryEmbeddingStore. With
+    `offline=True` the evaluation only uses the stored query embeddings and fails
+    on a missing query instead of calling the OpenAI API or running the model.
     """
-    def __init__(self, eval_path: str):
+    def __init__(self, eval_path: str, query_store_path: str = None, offline: bool = False):
         self.eval_path = eval_path
         self.eval_set = self._load_evaluation_data()
+        if offline and query_store_path is None:
+            raise ValueError("Offline evaluation requires a query embedding store.")
+        self.query_store = QueryEmbeddingStore(query_store_path, offline=offline) if query_store_path else None
         self.top_n_courses_openai = {}
         self.top_n_courses_transformers = {}
         self.top_n_courses_tfidf = {}
@@ -40,10 +59,28 @@ class IREvaluator:
             TfidfVectorizer: The pretrained TF-IDF vectorizer.
         """
         with open(filepath, "rb") as f:
-            tfidf_vectorizer = pickle.load(f)
+            tfidf_vectorizer = _VectorizerUnpickler(f).load()
         return tfidf_vectorizer
+
+    @staticmethod
+    def _tfidf_transform(vectorizer: TfidfVectorizer, texts: list[str], tfidf_processing: TFIDF):
+        """Transforms raw texts with a TF-IDF vectorizer. Vectorizers fitted with the
+        fused TokenAnalyzer take the raw text, older vectorizers take the preprocessed
+        tokens joined with spaces.
+
+        Args:
+            vectorizer (TfidfVectorizer): The pretrained TF-IDF vectorizer.
+            texts (list[str]): The texts to transform.
+            tfidf_processing (TFIDF): The TF-IDF preprocessing instance.
+
+        Returns:
+            scipy.sparse.csr_matrix: The sparse TF-IDF matrix of the texts.
+        """
+        if isinstance(vectorizer.analyzer, TokenAnalyzer):
+            return vectorizer.transform(texts)
+        return vectorizer.transform(" ".join(tfidf_processing.analyzer(text)) for text in texts)
     
-    def evaluate_tfidf_embeddings_ir(self, vectorizer_filepath: str, embeddings_filepath: str) -> dict[str, float]:
+    def evaluate_tfidf_embeddings_ir(self, vectorizer_filepath: str, embeddings_filepath: str, sparse: bool = True) -> dict[str, float]:
         """Evaluates the TF-IDF course embeddings on the evaluation set using as metrics
         the average of Normalized Discounted Cumulative Gain (NDCG) of the evaluation queries.
 
@@ -51,50 +88,51 @@ class IREvaluator:
             vectorizer_filepath (str): The path to the pickle file containing the pretrained 
             TF-IDF vectorizer.
             embeddings_filepath (str): The path to the pickle file containing the course embeddings.
+            sparse (bool, optional): Whether to score the queries with the sparse retrieval
+            that only touches the posting lists of the query terms. Defaults to True.
 
         Returns:
             dict[str, float]: A dictionary containing the metric scores for the evaluation set.
         """
         tfidf_processing = TFIDF()
         vectorizer = self._load_tfidf_vectorizer(vectorizer_filepath)
-        embeddings, course_codes = self._load_course_embeddings(embeddings_filepath)
-
-        ndcgs = []
-        for query in self.eval_set["queries"]:
-            query_df = tfidf_processing.preprocess(pd.DataFrame([query["query"]], columns=["query"]), "query")
-            query_embedding = vectorizer.transform(query_df["tokens"].apply(" ".join)).toarray()[0]
-            top_n_idx = self._vector_search(query_embedding, embeddings)
-            top_n_courses = course_codes[top_n_idx]
-            self.top_n_courses_tfidf[query["query"]] = top_n_courses
-            ndcg = self.calculate_ndcg(ground_truths=query["answers"], predictions=top_n_courses)
-            ndcgs.append(ndcg)
-        
-        return {"ndcg": np.mean(ndcgs)}
-
-    def evaluate_transformers_embeddings_ir(self, model: str, embeddings_filepath: str) -> dict[str, float]:
+        if sparse:
+            embeddings, course_codes = self._load_sparse_course_embeddings(embeddings_filepath)
+        else:
+            embeddings, course_codes = self._load_course_embeddings(embeddings_filepath)
+
+        queries = [query["query"] for query in self.eval_set["queries"]]
+        query_embeddings = self._tfidf_transform(vectorizer, queries, tfidf_processing)
+        if sparse:
+            # Only the columns of the query terms, i.e. their posting lists, are read
+            terms = np.unique(sp.csr_matrix(query_embeddings).indices)
+            scores = (query_embeddings[:, terms] @ embeddings[:, terms].T).toarray()
+        else:
+            scores = query_embeddings.toarray() @ embeddings.T
+
+        return self._evaluate_scores(scores, course_codes, self.top_n_courses_tfidf)
+
+    def evaluate_transformers_embeddings_ir(self, model: str, embeddings_filepath: str, batch_size: int = 64) -> dict[str, float]:
         """Evaluates the SentenceTransformer course embeddings on the evaluation set using as metrics
         the average of Normalized Discounted Cumulative Gain (NDCG) of the evaluation queries.
 
         Args:
             model (str): The name of the SentenceTransformer model to use.
             embeddings_filepath (str): The path to the pickle file containing the course embeddings.
+            batch_size (int, optional): Batch size for encoding the queries. Defaults to 64.
 
         Returns:
             dict[str, float]: A dictionary containing the metric scores for the evaluation set.
         """
-        model = SentenceTransformer(model)
         embeddings, course_codes = self._load_course_embeddings(embeddings_filepath)
 
-        ndcgs = []
-        for query in self.eval_set["queries"]:
-            query_embedding = model.encode(query["query"])
-            top_n_idx = self._vector_search(query_embedding, embeddings)
-            top_n_courses = course_codes[top_n_idx]
-            self.top_n_courses_transformers[query["query"]] = top_n_courses
-            ndcg = self.calculate_ndcg(ground_truths=query["answers"], predictions=top_n_courses)
-            ndcgs.append(ndcg)
-        
-        return {"ndcg": np.mean(ndcgs)}
+        queries = [query["query"] for query in self.eval_set["queries"]]
+        query_embeddings = self._encode_queries(
+            f"sentence-transformers/{model}", queries, self._transformers_encoder(model, batch_size)
+        )
+        scores = query_embeddings @ embeddings.T
+
+        return self._evaluate_scores(scores, course_codes, self.top_n_courses_transformers)
 
     def evaluate_openai_embeddings_ir(self, embeddings_filepath: str) -> dict[str, float]:
         """Evaluates the OpenAI course embeddings on the evaluation set using as metrics
@@ -106,20 +144,101 @@ class IREvaluator:
         Returns:
             dict[str, float]: A dictionary containing the metric scores for the evaluation set.
         """
-        client = OpenAI()
         embeddings, course_codes = self._load_course_embeddings(embeddings_filepath)
 
-        ndcgs = []
-        for query in self.eval_set["queries"]:
-            query_embedding = self._get_openai_embedding(query["query"], client=client)
-            top_n_idx = self._vector_search(query_embedding, embeddings)
-            top_n_courses = course_codes[top_n_idx]
-            self.top_n_courses_openai[query["query"]] = top_n_courses
-            ndcg = self.calculate_ndcg(ground_truths=query["answers"], predictions=top_n_courses)
-            ndcgs.append(ndcg)
+        queries = [query["query"] for query in self.eval_set["queries"]]
+        query_embeddings = self._encode_queries(
+            "openai/text-embedding-3-small", queries, self._openai_encoder()
+        )
+        scores = query_embeddings @ embeddings.T
+
+        return self._evaluate_scores(scores, course_codes, self.top_n_courses_openai)
+
+    def _openai_encoder(self, model="text-embedding-3-small"):
+        """Returns a function encoding a list of texts with the OpenAI API. The client
+        is only created when the function is called."""
+        return lambda texts: self._get_openai_embeddings(texts, client=OpenAI(), model=model)
+
+    def _transformers_encoder(self, model: str, batch_size: int = 64):
+        """Returns a function encoding a list of texts with a SentenceTransformer. The
+        model is only loaded when the function is called."""
+        return lambda texts: SentenceTransformer(model).encode(texts, batch_size=batch_size)
+
+    def _encode_queries(self, model: str, queries: list[str], encode) -> np.ndarray:
+        """Encodes the queries through the query embedding store if one is configured.
 
+        Args:
+            model (str): Name of the embedding model, used as part of the store key.
+            queries (list[str]): The query texts.
+            encode (Callable): Function encoding a list of texts.
+
+        Returns:
+            np.ndarray: The query embeddings of shape (queries, dimensions).
+        """
+        if self.query_store is None:
+            return np.asarray(encode(queries))
+        return self.query_store.get_many(model, queries, encode)
+
+    def prefill_query_store(self, transformers_models: list[str] = None, openai: bool = True) -> None:
+        """Encodes all evaluation queries missing from the query embedding store in bulk,
+        so that later evaluations can run offline.
+
+        Args:
+            transformers_models (list[str], optional): SentenceTransformer models to prefill.
+            openai (bool, optional): Whether to prefill the OpenAI embeddings. Defaults to True.
+        """
+        if self.query_store is None:
+            raise ValueError("No query embedding store configured.")
+        transformers_models = transformers_models or []
+        queries = [query["query"] for query in self.eval_set["queries"]]
+        if openai:
+            n = self.query_store.prefill("openai/text-embedding-3-small", queries, self._openai_encoder())
+            print(f"Prefilled {n} OpenAI query embeddings")
+        for model in transformers_models:
+            n = self.query_store.prefill(f"sentence-transformers/{model}", queries, self._transformers_encoder(model))
+            print(f"Prefilled {n} {model} query embeddings")
+
+    def _evaluate_scores(self, scores: np.ndarray, course_codes: pd.Series, top_n_courses: dict, top_n=5) -> dict[str, float]:
+        """Ranks the courses for all evaluation queries at once from a query x course
+        score matrix and calculates the average NDCG.
+
+        Args:
+            scores (np.ndarray): The similarity scores of shape (queries, courses).
+            course_codes (pd.Series): The course codes of the course embeddings.
+            top_n_courses (dict): Dictionary where the top_n courses of each query are stored.
+            top_n (int, optional): Number of most similar courses to retrieve. Defaults to 5.
+
+        Returns:
+            dict[str, float]: A dictionary containing the metric scores for the evaluation set.
+        """
+        top_n_idx = self._batch_top_n(np.asarray(scores), top_n)
+        predictions = course_codes.to_numpy()[top_n_idx]
+
+        for query, idx in zip(self.eval_set["queries"], top_n_idx):
+            top_n_courses[query["query"]] = course_codes[idx]
+
+        ground_truths = [query["answers"] for query in self.eval_set["queries"]]
+        ndcgs = self.calculate_ndcg_batch(ground_truths, predictions)
         return {"ndcg": np.mean(ndcgs)}
 
+    @staticmethod
+    def _batch_top_n(scores: np.ndarray, top_n: int) -> np.ndarray:
+        """Returns the indices of the top_n highest scores of each row in descending
+        order using a partial sort.
+
+        Args:
+            scores (np.ndarray): The scores of shape (queries, courses).
+            top_n (int): Number of highest scores to return per row.
+
+        Returns:
+            np.ndarray: The indices of shape (queries, top_n).
+        """
+        top_n = min(top_n, scores.shape[1])
+        top_n_idx = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        top_scores = np.take_along_axis(scores, top_n_idx, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top_n_idx, order, axis=1)
+
     def _load_course_embeddings(self, filepath: str) -> tuple[np.ndarray, pd.Series]:
         """Loads the course embeddings and course codes from a given file. File
         must be a pickle file of the format where the first column is the course 
@@ -139,41 +258,76 @@ class IREvaluator:
         course_codes = embeddings_df["course_code"]
         return embeddings, course_codes
 
-    def _get_openai_embedding(self, text: str, client: OpenAI, model="text-embedding-3-small") -> np.ndarray:
-        """Get the OpenAI embedding for a given text using the OpenAI API. You need
-        to have set up the OpenAI API key in your environment variables to use this.
-        Check the OpenAI API documentation for more information on how to set up the
-        API key.
+    def _load_sparse_course_embeddings(self, filepath: str) -> tuple[sp.csc_matrix, pd.Series]:
+        """Loads the TF-IDF course embeddings as a sparse matrix in CSC format, so that
+        the columns of the query terms can be accessed directly. The embeddings can be
+        stored either as dense numpy arrays or as sparse rows.
+
+        Args:
+            filepath (str): The path to the pickle file containing the course embeddings.
+
+        Returns:
+            tuple[sp.csc_matrix, pd.Series]: A tuple containing the course embeddings as a
+            sparse matrix and the course codes as Pandas Series.
+        """
+        embeddings_df = pd.read_pickle(filepath)
+        embeddings = embeddings_df["embedding"].to_list()
+        if sp.issparse(embeddings[0]):
+            embeddings = sp.vstack(embeddings)
+        else:
+            embeddings = sp.csr_matrix(np.vstack(embeddings))
+        course_codes = embeddings_df["course_code"]
+        return embeddings.tocsc(), course_codes
+
+    def _get_openai_embeddings(self, texts: list[str], client: OpenAI, model="text-embedding-3-small", batch_size=1000) -> np.ndarray:
+        """Get the OpenAI embeddings for a list of texts with one API call per batch
+        of texts.
 
         Args:
-            text (str): Text to be encoded.
+            texts (list[str]): Texts to be encoded.
             client (openai.OpenAI): OpenAI client object.
-            model (str, optional): Name of the model used for embeddings. 
+            model (str, optional): Name of the model used for embeddings.
             Defaults to "text-embedding-3-small".
+            batch_size (int, optional): Number of texts per API call. Defaults to 1000.
 
         Returns:
-            np.ndarray: The embedding of the text.
+            np.ndarray: The embeddings of the texts of shape (texts, dimensions).
         """
-        text = text.replace("\n", " ")
-        embedding = client.embeddings.create(input = [text], model=model).data[0].embedding
-        return embedding
-    
-    def _vector_search(self, query: np.ndarray, embeddings: np.ndarray, top_n=5) -> np.ndarray:
-        """Searches for the top_n most similar vectors to the query vector in the
-        embeddings matrix using the dot product as similarity measure.
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            data = client.embeddings.create(input=texts[start : start + batch_size], model=model).data
+            embeddings.extend(item.embedding for item in data)
+        return np.array(embeddings)
+
+    @staticmethod
+    def calculate_ndcg_batch(ground_truths: list[list[str]], predictions: np.ndarray) -> np.ndarray:
+        """Calculates the NDCG of many queries at once, see calculate_ndcg for the
+        definition.
 
         Args:
-            query (np.ndarray): The query embedding vector.
-            embeddings (np.ndarray): The embeddings matrix.
-            top_n (int, optional): Number of most similar instances to search. 
-            Defaults to 5.
+            ground_truths (list[list[str]]): The relevant course codes of each query.
+            predictions (np.ndarray): The predicted course codes of shape (queries, k).
 
         Returns:
-            np.ndarray: The indices of the top_n most similar vectors.
+            np.ndarray: The NDCG score of each query.
         """
-        scores = np.dot(embeddings, query)
-        top_n_idx = scores.argsort()[::-1][:top_n]
-        return top_n_idx
+        predictions = np.asarray(predictions, dtype=object)
+        k = predictions.shape[1]
+
+        relevances = np.arange(k, 0, -1)
+        discounts = 1 / np.log2(np.arange(k) + 2)
+        idcg = np.sum(relevances * discounts)
+
+        # Pad the ground truths to k codes, the padding never matches
+        truths = np.array(
+            [list(gt[:k]) + [None] * (k - len(gt[:k])) for gt in ground_truths], dtype=object
+        )
+        matches = (predictions[:, :, None] == truths[:, None, :]).astype(bool)
+        # The first matching ground truth has the highest relevance
+        rel = np.max(matches * relevances[None, None, :], axis=2)
+
+        return (rel * discounts).sum(axis=1) / idcg
 
     @staticmethod
     def calculate_ndcg(ground_truths: list[str], predictions: list[str]) -> float:
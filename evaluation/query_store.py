@@ -0,0 +1,79 @@
+import os
+import pickle
+import numpy as np
+from typing import Callable
+
+
+class QueryEmbeddingStore:
+    """Persistent store of query embeddings keyed by (model, query text), so that
+    repeated evaluations neither call the embedding API nor run the model again.
+    The store is a versioned pickle file; a file written with another version is
+    ignored so that stale embeddings are never mixed in.
+
+    In offline mode a query missing from the store raises a KeyError instead of
+    being encoded, which makes evaluations deterministic and runnable without
+    network access.
+    """
+
+    VERSION = 1
+
+    def __init__(self, filepath: str, offline: bool = False):
+        self.filepath = filepath
+        self.offline = offline
+        self.embeddings = {}
+        if os.path.exists(filepath):
+            with open(filepath, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") == self.VERSION:
+                self.embeddings = data["embeddings"]
+            else:
+                print(f"Ignoring query embedding store {filepath} with version {data.get('version')}")
+
+    def save(self):
+        """Writes the store to disk atomically."""
+        tmp = self.filepath + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": self.VERSION, "embeddings": self.embeddings}, f)
+        os.replace(tmp, self.filepath)
+
+    def prefill(self, model: str, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> int:
+        """Encodes and stores the texts that are missing from the store in one batch.
+
+        Args:
+            model (str): Name of the embedding model, part of the key.
+            texts (list[str]): The query texts.
+            encode (Callable): Function encoding a list of texts into an array of
+            shape (texts, dimensions).
+
+        Returns:
+            int: The number of newly encoded texts.
+        """
+        missing = list(dict.fromkeys(t for t in texts if (model, t) not in self.embeddings))
+        if missing:
+            for text, embedding in zip(missing, np.asarray(encode(missing))):
+                self.embeddings[(model, text)] = embedding
+            self.save()
+        return len(missing)
+
+    def get_many(self, model: str, texts: list[str], encode: Callable[[list[str]], np.ndarray] = None) -> np.ndarray:
+        """Returns the embeddings of the texts. Missing texts are encoded with `encode`
+        and stored, unless the store is offline.
+
+        Args:
+            model (str): Name of the embedding model, part of the key.
+            texts (list[str]): The query texts.
+            encode (Callable, optional): Function encoding a list of texts into an array
+            of shape (texts, dimensions).
+
+        Returns:
+            np.ndarray: The embeddings of shape (texts, dimensions).
+        """
+        missing = [t for t in texts if (model, t) not in self.embeddings]
+        if missing:
+            if self.offline or encode is None:
+                raise KeyError(
+                    f"{len(missing)} queries have no stored '{model}' embedding in "
+                    f"{self.filepath}, e.g. {missing[0]!r}. Prefill the store online first."
+                )
+            self.prefill(model, missing, encode)
+        return np.vstack([self.embeddings[(model, t)] for t in texts])
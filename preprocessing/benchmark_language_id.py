@@ -0,0 +1,47 @@
+import time
+import pandas as pd
+from langdetect import detect
+
+from language_id import LanguageIdentifier
+from preprocessing_utils import concat_course_info
+
+
+def detect_full_text(text: str) -> str:
+    """The previous behaviour: langdetect on the full description."""
+    try:
+        return detect(text)
+    except Exception:
+        return "unknown"
+
+
+def time_per_1000(func, texts: list[str]) -> tuple[list[str], float]:
+    """Run the detector over the texts, returning the results and seconds per 1,000 texts."""
+    start = time.perf_counter()
+    results = func(texts)
+    elapsed = time.perf_counter() - start
+    return results, 1000 * elapsed / len(texts)
+
+
+if __name__ == "__main__":
+
+    df = pd.read_csv("../scraper/data/course_data.csv")
+    texts = df.apply(concat_course_info, axis=1).to_list()
+    codes = df["course_code"].to_list()
+
+    old, old_cost = time_per_1000(lambda t: [detect_full_text(x) for x in t], texts)
+
+    language_id = LanguageIdentifier()
+    new, new_cost = time_per_1000(lambda t: language_id.detect_batch(t, codes), texts)
+    cached, cached_cost = time_per_1000(lambda t: language_id.detect_batch(t, codes), texts)
+
+    # The translator only decides between English and everything else
+    is_en = lambda lang: lang in ["en", "unknown"]
+    agreement = sum(a == b for a, b in zip(old, new)) / len(texts)
+    decision_agreement = sum(is_en(a) == is_en(b) for a, b in zip(old, new)) / len(texts)
+
+    print(f"{len(texts)} courses")
+    print(f"langdetect on full text: {old_cost:.1f} s per 1,000 courses")
+    print(f"LanguageIdentifier:      {new_cost:.1f} s per 1,000 courses")
+    print(f"LanguageIdentifier cached: {cached_cost:.3f} s per 1,000 courses")
+    print(f"Language agreement: {agreement:.1%}")
+    print(f"Translate/skip decision agreement: {decision_agreement:.1%}")
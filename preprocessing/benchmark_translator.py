@@ -0,0 +1,77 @@
+import time
+import spacy
+import argparse
+import psutil
+import pandas as pd
+from sacrebleu import corpus_bleu
+
+from translator import Translator, BACKENDS
+from preprocessing_utils import concat_course_info, split_text
+
+
+def load_sample(n_courses: int = 50, seed: int = 0) -> list[str]:
+    """
+    Fixed sample of sentence chunks from the course descriptions.
+    """
+    df = pd.read_csv("../scraper/data/course_data.csv")
+    df = df.sample(n=min(n_courses, len(df)), random_state=seed)
+    descriptions = df.apply(concat_course_info, axis=1)
+
+    sentencizer = spacy.blank("en")
+    sentencizer.add_pipe("sentencizer")
+
+    chunks = []
+    for text in descriptions:
+        if text:
+            chunks.extend(split_text(text, sentencizer, n=100))
+    return chunks
+
+
+def benchmark(backend: str, chunks: list[str], batch_size: int) -> dict:
+    """
+    Load the backend and translate the chunks without the translation memory.
+    """
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    translator = Translator("Helsinki-NLP/opus-tatoeba-fi-en", backend=backend)
+    load_time = time.perf_counter() - start
+    rss_model = process.memory_info().rss - rss_before
+
+    start = time.perf_counter()
+    outputs = translator.translate_chunks(chunks, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_s": load_time,
+        "model_rss_mb": rss_model / 2**20,
+        "translate_s": elapsed,
+        "sentences_per_s": len(chunks) / elapsed,
+        "outputs": [o or "" for o in outputs],
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS)
+    args = parser.parse_args()
+
+    chunks = load_sample(args.courses)
+    print(f"Benchmarking {len(chunks)} sentences from {args.courses} courses")
+
+    # The fp32 PyTorch model is the reference for the BLEU drift
+    results = [benchmark("torch", chunks, args.batch_size)]
+    reference = results[0]["outputs"]
+    for backend in args.backends:
+        if backend != "torch":
+            results.append(benchmark(backend, chunks, args.batch_size))
+
+    for result in results:
+        result["bleu_vs_torch"] = corpus_bleu(result.pop("outputs"), [reference]).score
+
+    print(pd.DataFrame(results).round(2).to_string(index=False))
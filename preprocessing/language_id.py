@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import zlib
+
+from langdetect import DetectorFactory, detect
+
+# Make langdetect deterministic
+DetectorFactory.seed = 0
+
+# Frequent function words of the course description languages
+STOPWORDS = {
+    "en": {
+        "the", "and", "of", "to", "in", "is", "for", "with", "are", "be",
+        "will", "this", "as", "an", "can", "course", "students", "student", "how",
+    },
+    "fi": {
+        "ja", "on", "että", "tai", "sekä", "ovat", "myös", "ei", "se", "joka",
+        "kanssa", "mukaan", "kurssi", "kurssin", "kurssilla", "opiskelija",
+        "osaa", "jälkeen", "kuten", "eri", "miten",
+    },
+    "sv": {
+        "och", "att", "som", "för", "med", "av", "är", "på", "det", "den",
+        "kursen", "studenten", "kan", "till", "om", "efter",
+    },
+}
+
+WORD = re.compile(r"[a-zåäö]+")
+
+
+class LanguageIdentifier:
+    """
+    Fast language identification for course descriptions. Looks only at a
+    bounded prefix of the text and first tries a cheap function-word vote.
+    Only when the vote is inconclusive is the prefix passed to the n-gram
+    detector of langdetect (seeded, so the result is deterministic). Results
+    are cached per course code and prefix checksum, so an edited description
+    is detected again, and the cache can be persisted to a JSON file.
+    """
+
+    def __init__(self, prefix_chars: int = 400, cache_path: str = None):
+        self.prefix_chars = prefix_chars
+        self.cache_path = cache_path
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                self.cache = json.load(f)
+
+    def _vote(self, text: str):
+        """Language by function-word counts, or None if inconclusive."""
+        words = WORD.findall(text.lower())
+        counts = sorted(
+            ((sum(w in stopwords for w in words), lang) for lang, stopwords in STOPWORDS.items()),
+            reverse=True,
+        )
+        (best, lang), (second, _) = counts[0], counts[1]
+        if best >= 3 and best >= 2 * second:
+            return lang
+        return None
+
+    def detect(self, text: str, course_code: str = None) -> str:
+        """
+        Detect the language of the text. Returns 'unknown' if no language
+        could be detected.
+        """
+        prefix = text[: self.prefix_chars]
+        key = None
+        if course_code is not None:
+            key = f"{course_code}:{zlib.crc32(prefix.encode('utf-8'))}"
+            if key in self.cache:
+                return self.cache[key]
+
+        lang = self._vote(prefix)
+        if lang is None:
+            try:
+                lang = detect(prefix)
+            except Exception:
+                lang = "unknown"
+
+        if key is not None:
+            self.cache[key] = lang
+        return lang
+
+    def detect_batch(self, texts: list[str], course_codes: list[str] = None) -> list[str]:
+        """Detect the languages of many texts."""
+        course_codes = course_codes or [None] * len(texts)
+        return [self.detect(t, c) for t, c in zip(texts, course_codes)]
+
+    def save(self):
+        if self.cache_path:
+            with open(self.cache_path, "w") as f:
+                json.dump(self.cache, f)
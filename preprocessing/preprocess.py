@@ -1,17 +1,32 @@
+import os
+import sys
 from typing import Tuple
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from datasets import Dataset
-from translator import Translator
+from translator import Translator, translate_dataset_sharded
 
 from preprocessing_utils import concat_course_info
 from tfidf import TFIDF
 
 
-def preprocess(vectorize=False):
+def preprocess(
+    vectorize=False,
+    course_codes=None,
+    batch_size=32,
+    num_threads=None,
+    num_workers=1,
+    memory_path="translation_memory.sqlite",
+    language_cache_path="language_cache.json",
+    backend="torch",
+):
     # Load the data
     df = pd.read_csv("../scraper/data/course_data.csv")
 
+    # Only process the given courses, e.g. the ones changed by refresh_sisu
+    if course_codes is not None:
+        df = df[df["course_code"].isin(course_codes)].reset_index(drop=True)
+
     # Apply the concatenation pipeline
     df["course_description"] = df.apply(concat_course_info, axis=1)
 
@@ -19,16 +34,46 @@ def preprocess(vectorize=False):
     dataset = Dataset.from_pandas(df)
 
     # Apply the translation pipeline
-    translator = Translator(model_name="Helsinki-NLP/opus-tatoeba-fi-en")
-    dataset = translator.translate_dataset(dataset, "course_description")
+    model_name = "Helsinki-NLP/opus-tatoeba-fi-en"
+    if num_workers > 1:
+        # Only the worker processes load the model
+        dataset = translate_dataset_sharded(
+            dataset,
+            "course_description",
+            model_name,
+            num_workers=num_workers,
+            batch_size=batch_size,
+            threads_per_worker=num_threads,
+            memory_path=memory_path,
+            backend=backend,
+            language_cache_path=language_cache_path,
+        )
+    else:
+        translator = Translator(
+            model_name,
+            memory_path=memory_path,
+            backend=backend,
+            language_cache_path=language_cache_path,
+        )
+        dataset = translator.translate_dataset_batched(
+            dataset, "course_description", batch_size=batch_size, num_threads=num_threads
+        )
 
     # Remove __index_level_0__ column if it exists
     if "__index_level_0__" in dataset.column_names:
         dataset = dataset.remove_columns("__index_level_0__")
 
     # Save the translated dataset
-    dataset.to_csv("translated_course_data_V2.csv")
-    print("Saved translated dataset to translated_course_data.csv")
+    filename = "translated_course_data_V2.csv"
+    if course_codes is not None and os.path.exists(filename):
+        # Replace the given courses in the full translated dataset, which is
+        # then passed to VectorDB.sync_courses to re-embed the changed ones
+        full = pd.read_csv(filename)
+        full = full[~full["course_code"].isin(course_codes)]
+        merged = pd.concat([full, dataset.to_pandas()], ignore_index=True)
+        dataset = Dataset.from_pandas(merged, preserve_index=False)
+    dataset.to_csv(filename)
+    print(f"Saved translated dataset to {filename}")
 
     if not vectorize:
         return dataset, None, None
@@ -36,12 +81,17 @@ def preprocess(vectorize=False):
     # Calculate the tf-idf
     dataset = dataset.to_pandas()
     tfidf = TFIDF()
-    dataset = tfidf.preprocess(dataset, "course_description_en")
-    X = tfidf.fit_transform(dataset, "tokens")
+    X = tfidf.fit_transform_text(dataset, "course_description_en")
     tfidf_vectorizer = tfidf.get_vectorizer()
 
     return dataset, X, tfidf_vectorizer
 
 
 if __name__ == "__main__":
-    dataset, X, tfidfvectorizer = preprocess()
+    # python preprocess.py --changed only translates the courses changed by
+    # refresh_sisu and merges them into the full translated dataset
+    course_codes = None
+    if "--changed" in sys.argv:
+        with open("../scraper/data/changed_course_codes.txt", "r") as f:
+            course_codes = f.read().split()
+    dataset, X, tfidfvectorizer = preprocess(course_codes=course_codes)
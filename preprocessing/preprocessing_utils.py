@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Generator
+from typing import Generator, Iterable, Tuple
 from ast import literal_eval
 from collections import deque
 
@@ -32,6 +32,46 @@ def split_text(text: str, tokenizer, n: int = 100) -> Generator[str, None, None]
     yield part
 
 
+def split_texts(
+    texts: Iterable[str],
+    tokenizer,
+    n: int = 100,
+    row_ids: Iterable = None,
+    n_process: int = 1,
+    batch_size: int = 256,
+) -> Generator[Tuple[int, str], None, None]:
+    """Split many texts into parts under n characters, like split_text.
+
+    The texts are streamed through tokenizer.pipe, and each part is built
+    from the sentence lengths and a single join instead of growing a string.
+    Yields (row_id, part) pairs, where row_id defaults to the position of the
+    text in `texts`. Empty texts yield no parts.
+    """
+    if row_ids is None:
+        texts = ((text, row_id) for row_id, text in enumerate(texts))
+    else:
+        texts = zip(texts, row_ids)
+
+    docs = tokenizer.pipe(
+        texts, as_tuples=True, n_process=n_process, batch_size=batch_size
+    )
+    for doc, row_id in docs:
+        sentences = [s.text for s in doc.sents]
+        if not sentences:
+            continue
+
+        start, length = 0, len(sentences[0])
+        for idx in range(1, len(sentences)):
+            next_length = len(sentences[idx])
+            if length + 1 + next_length <= n:
+                length += 1 + next_length
+            else:
+                yield row_id, " ".join(sentences[start:idx])
+                start, length = idx, next_length
+
+        yield row_id, " ".join(sentences[start:])
+
+
 def prune_courses(idx, data, min_sim=0.86, verbose=False):
     """
     Args:
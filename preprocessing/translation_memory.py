@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+
+def normalize_sentence(text: str) -> str:
+    """Collapse whitespace so that layout differences do not miss the cache."""
+    return " ".join(text.split())
+
+
+class TranslationMemory:
+    """
+    Persistent sentence-level translation memory stored in SQLite, keyed on
+    the normalised source sentence and the model name. Counts the hits and
+    misses of the lookups so the hit rate of a run can be reported.
+    """
+
+    def __init__(self, path: str = "translation_memory.sqlite"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                model TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                PRIMARY KEY (model, source)
+            )
+            """
+        )
+        self.conn.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_many(self, sentences: list[str], model: str) -> dict[str, str]:
+        """
+        Look up the translations of the sentences. Returns a mapping from the
+        normalised source sentence to its translation for the hits only.
+        """
+        keys = list({normalize_sentence(s) for s in sentences})
+        found = {}
+        with self.lock:
+            # Stay below SQLite's limit on the number of query parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"""
+                    SELECT source, target FROM translations
+                    WHERE model = ? AND source IN ({placeholders})
+                    """,
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+
+        hits = sum(normalize_sentence(s) in found for s in sentences)
+        self.hits += hits
+        self.misses += len(sentences) - hits
+        return found
+
+    def put_many(self, translations: dict[str, str], model: str):
+        """Store translations keyed on their (normalised) source sentence."""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?)",
+                [
+                    (model, normalize_sentence(source), target)
+                    for source, target in translations.items()
+                ],
+            )
+            self.conn.commit()
@@ -1,24 +1,149 @@
+import os
+import time
+import shutil
+import torch
 import spacy
 import logging
 
-from datasets import Dataset
-from langdetect import detect
-from preprocessing_utils import split_text
+from datasets import Dataset, concatenate_datasets
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from language_id import LanguageIdentifier
+from preprocessing_utils import split_text, split_texts
+from translation_memory import TranslationMemory, normalize_sentence
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 
 
+BACKENDS = ["torch", "int8", "onnx"]
+
+# Directory of the exported ONNX models, one subdirectory per model
+ONNX_DIR = "onnx_models"
+
+
+def export_onnx(model_name: str) -> str:
+    """
+    Export the model to ONNX once and return the directory it is saved in.
+    Later calls reuse the export. The export is written to a temporary
+    directory first, so concurrent workers never load a partial export.
+    """
+    path = os.path.join(ONNX_DIR, model_name.replace("/", "--"))
+    if os.path.exists(path):
+        return path
+
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise ImportError(
+            "The onnx backend requires optimum, install it with "
+            "`pip install optimum[onnxruntime]`"
+        )
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True).save_pretrained(tmp_path)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process finished its export first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+def load_model(model_name: str, backend: str = "torch"):
+    """
+    Load the seq2seq model with the given inference backend. All backends
+    expose the same `generate` interface.
+
+    - torch: The full fp32 PyTorch model.
+    - int8: PyTorch with dynamic int8 quantisation of the linear layers.
+    - onnx: ONNX Runtime export via optimum, with the decoder reusing the
+      cached key/value states between generation steps. The model is exported
+      once to ONNX_DIR and loaded from there afterwards.
+    """
+    if backend == "torch":
+        return AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+    if backend == "int8":
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        return torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            raise ImportError(
+                "The onnx backend requires optimum, install it with "
+                "`pip install optimum[onnxruntime]`"
+            )
+        return ORTModelForSeq2SeqLM.from_pretrained(
+            export_onnx(model_name), use_cache=True
+        )
+
+    raise ValueError(f"Unknown backend '{backend}', choose one of {BACKENDS}")
+
+
+# Translator instance of a sharded translation worker process
+_worker_translator = None
+
+
+def _init_worker(
+    model_name: str,
+    max_length: int,
+    num_threads: int,
+    memory_path: str,
+    backend: str,
+    language_cache_path: str,
+):
+    """Load the model once per worker process and pin its intra-op threads."""
+    global _worker_translator
+    torch.set_num_threads(num_threads)
+    _worker_translator = Translator(
+        model_name,
+        max_length=max_length,
+        memory_path=memory_path,
+        backend=backend,
+        language_cache_path=language_cache_path,
+    )
+
+
+def _translate_shard(shard: Dataset, colname: str, batch_size: int) -> tuple[Dataset, dict]:
+    """Translate a shard and return it with the worker's language cache, which
+    the parent saves so that the workers do not overwrite each other's file."""
+    translated = _worker_translator.translate_dataset_batched(
+        shard, colname, batch_size, save_language_cache=False
+    )
+    return translated, _worker_translator.language_id.cache
+
+
 class Translator:
     """
     Translation model instance for translating a dataset using a Huggingface model
     """
 
-    def __init__(self, model_name, max_length=512):
+    def __init__(
+        self,
+        model_name,
+        max_length=512,
+        memory_path=None,
+        backend="torch",
+        language_cache_path=None,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        # Optional persistent translation memory for repeated sentences,
+        # keyed per backend since quantised outputs can differ slightly
+        self.memory_path = memory_path
+        self.memory = TranslationMemory(memory_path) if memory_path else None
+        self.memory_key = model_name if backend == "torch" else f"{model_name}:{backend}"
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        self.model = load_model(model_name, backend)
         self.max_length = max_length
         # Load the English language model for sentence splitting
         self.sentencizer = spacy.blank("en")
         self.sentencizer.add_pipe("sentencizer")
+        # Optional persistent cache of the detected languages per course
+        self.language_cache_path = language_cache_path
+        self.language_id = LanguageIdentifier(cache_path=language_cache_path)
 
     def translation_pipeline(self, row: dict, colname: str) -> dict:
         """
@@ -33,13 +158,9 @@ class Translator:
             row[f"{colname}_en"] = ""
             return row
 
-        # If the text is already in English, return the original text
-        try:
-            if detect(text) == "en":
-                row[f"{colname}_en"] = text
-                return row
-        except Exception as e:
-            logging.error(f"Error detecting language: {e}")
+        # If the text is already in English or the language is unknown,
+        # return the original text
+        if self.language_id.detect(text, row.get("course_code")) in ["en", "unknown"]:
             row[f"{colname}_en"] = text
             return row
 
@@ -50,6 +171,12 @@ class Translator:
 
             # Translate each part
             for chunk in parts:
+                if self.memory is not None:
+                    cached = self.memory.get_many([chunk], self.memory_key)
+                    if cached:
+                        output_text.append(cached[normalize_sentence(chunk)])
+                        continue
+
                 input_ids = self.tokenizer.encode(
                     chunk,
                     return_tensors="pt",
@@ -61,6 +188,8 @@ class Translator:
                     output_ids[0], skip_special_tokens=True
                 )
                 output_text.append(out_text)
+                if self.memory is not None:
+                    self.memory.put_many({chunk: out_text}, self.memory_key)
 
             # Concatenate and save the translated text
             row[f"{colname}_en"] = " ".join(output_text)
@@ -80,3 +209,234 @@ class Translator:
         # Apply the translation pipeline to the dataset
         dataset = dataset.map(self.translation_pipeline, fn_kwargs={"colname": colname})
         return dataset
+
+    def _skip_translation(self, text: str, language: str):
+        """
+        Returns (True, output) for text that needs no translation, i.e. empty,
+        English or undetectable text, and (False, None) otherwise.
+        """
+        if text == "":
+            return True, ""
+        if language in ["en", "unknown"]:
+            return True, text
+        return False, None
+
+    def translate_chunks(self, chunks: list[str], batch_size: int = 32) -> list[str]:
+        """
+        Translate a list of text chunks in padded batches. The chunks are sorted
+        by length so that each batch holds chunks of similar length and little
+        padding. Sentences found in the translation memory, and repeats within
+        the list, are not sent to the model. Returns the translations in the
+        original order, with None for chunks in batches that failed.
+        """
+        cached = {}
+        if self.memory is not None:
+            cached = self.memory.get_many(chunks, self.memory_key)
+
+        # Each distinct sentence missing from the memory is translated once
+        todo = list(
+            {
+                normalize_sentence(c): c
+                for c in chunks
+                if normalize_sentence(c) not in cached
+            }.values()
+        )
+        order = sorted(range(len(todo)), key=lambda i: len(todo[i]))
+        translated = {}
+
+        for start in range(0, len(order), batch_size):
+            idx = order[start : start + batch_size]
+            try:
+                inputs = self.tokenizer(
+                    [todo[i] for i in idx],
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                )
+                with torch.inference_mode():
+                    output_ids = self.model.generate(**inputs, max_length=self.max_length)
+                texts = self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+                batch = {todo[i]: text for i, text in zip(idx, texts)}
+                translated.update(batch)
+                if self.memory is not None:
+                    self.memory.put_many(batch, self.memory_key)
+            except Exception as e:
+                logging.error(f"Error translating batch: {e}")
+
+        translated = {normalize_sentence(k): v for k, v in translated.items()}
+        translated.update(cached)
+        return [translated.get(normalize_sentence(c)) for c in chunks]
+
+    def translate_dataset_batched(
+        self,
+        dataset: Dataset,
+        colname: str,
+        batch_size: int = 32,
+        num_threads: int = None,
+        save_language_cache: bool = True,
+    ) -> Dataset:
+        """
+        Translate the dataset by batching sentence chunks across rows instead of
+        translating one chunk at a time. Gives the same output column as
+        translate_dataset.
+
+        Args:
+            batch_size (int): Number of chunks per generate call.
+            num_threads (int): Number of intra-op threads used by torch.
+            save_language_cache (bool): Save the detected languages to the
+            language cache file, if one is configured.
+        """
+        if colname not in dataset.column_names:
+            raise ValueError(f"The dataset must contain a column named '{colname}'")
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        # Collect the chunks of all rows that need translating
+        texts = dataset[colname]
+        course_codes = (
+            dataset["course_code"] if "course_code" in dataset.column_names else None
+        )
+        languages = self.language_id.detect_batch(texts, course_codes)
+        if save_language_cache:
+            self.language_id.save()
+
+        outputs = [None] * len(dataset)
+        to_translate, row_ids = [], []
+        for row_idx, (text, language) in enumerate(zip(texts, languages)):
+            skip, output = self._skip_translation(text, language)
+            if skip:
+                outputs[row_idx] = output
+            else:
+                to_translate.append(text)
+                row_ids.append(row_idx)
+
+        # Split all texts in one pass through the sentencizer
+        chunks, owners = [], []
+        for row_idx, chunk in split_texts(
+            to_translate, self.sentencizer, n=100, row_ids=row_ids
+        ):
+            chunks.append(chunk)
+            owners.append(row_idx)
+
+        if self.memory is not None:
+            self.memory.reset_stats()
+
+        start = time.perf_counter()
+        translations = self.translate_chunks(chunks, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        if chunks:
+            print(
+                f"Translated {len(chunks)} sentences in {elapsed:.1f} s "
+                f"({len(chunks) / elapsed:.1f} sentences/s)"
+            )
+        if self.memory is not None:
+            print(f"Translation memory hit rate {self.memory.hit_rate():.1%}")
+
+        # Put the translations back into their rows, a failed chunk fails its row
+        parts = {}
+        for row_idx, translation in zip(owners, translations):
+            parts.setdefault(row_idx, []).append(translation)
+        for row_idx, row_parts in parts.items():
+            if any(part is None for part in row_parts):
+                outputs[row_idx] = None
+            else:
+                outputs[row_idx] = " ".join(row_parts)
+
+        return dataset.add_column(f"{colname}_en", outputs)
+
+    def translate_dataset_sharded(
+        self,
+        dataset: Dataset,
+        colname: str,
+        num_workers: int = None,
+        batch_size: int = 32,
+        threads_per_worker: int = None,
+    ) -> Dataset:
+        """
+        Translate the dataset in parallel worker processes with this translator's
+        settings, see translate_dataset_sharded.
+        """
+        return translate_dataset_sharded(
+            dataset,
+            colname,
+            self.model_name,
+            num_workers=num_workers,
+            batch_size=batch_size,
+            threads_per_worker=threads_per_worker,
+            max_length=self.max_length,
+            memory_path=self.memory_path,
+            backend=self.backend,
+            language_cache_path=self.language_cache_path,
+        )
+
+
+def translate_dataset_sharded(
+    dataset: Dataset,
+    colname: str,
+    model_name: str,
+    num_workers: int = None,
+    batch_size: int = 32,
+    threads_per_worker: int = None,
+    max_length: int = 512,
+    memory_path: str = None,
+    backend: str = "torch",
+    language_cache_path: str = None,
+) -> Dataset:
+    """
+    Translate the dataset in parallel worker processes. The dataset is split
+    into contiguous shards, each worker loads its own copy of the model and
+    translates its shards with translate_dataset_batched, and the results are
+    concatenated back in the original order. The calling process does not load
+    the model.
+
+    Args:
+        num_workers (int): Number of worker processes, defaults to the CPU count.
+        threads_per_worker (int): Intra-op threads per worker, defaults to
+        an even split of the CPU cores between the workers.
+    """
+    if colname not in dataset.column_names:
+        raise ValueError(f"The dataset must contain a column named '{colname}'")
+
+    cpu_count = os.cpu_count() or 1
+    num_workers = min(num_workers or cpu_count, len(dataset)) or 1
+    threads_per_worker = threads_per_worker or max(1, cpu_count // num_workers)
+
+    # Export once here instead of in every worker
+    if backend == "onnx":
+        export_onnx(model_name)
+
+    shards = [
+        dataset.shard(num_workers, idx, contiguous=True) for idx in range(num_workers)
+    ]
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            model_name,
+            max_length,
+            threads_per_worker,
+            memory_path,
+            backend,
+            language_cache_path,
+        ),
+    ) as executor:
+        results = list(
+            executor.map(
+                _translate_shard,
+                shards,
+                [colname] * num_workers,
+                [batch_size] * num_workers,
+            )
+        )
+
+    # Merge the languages detected by the workers into one cache file
+    if language_cache_path:
+        language_id = LanguageIdentifier(cache_path=language_cache_path)
+        for _, cache in results:
+            language_id.cache.update(cache)
+        language_id.save()
+
+    return concatenate_datasets([translated for translated, _ in results])
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import pandas as pd
+
+from typing import Dict, Generator, Set
+
+COLUMNS = ["course_code", "course_name", "credits", "course_info", "url"]
+
+
+class ScrapeLog:
+    """
+    Append-only JSONL log of scraped course records. Every record carries its
+    URL, so the log doubles as the record of completed URLs and an interrupted
+    scrape can be resumed by skipping them. A partially written last line from
+    a crash is ignored.
+    """
+
+    def __init__(self, path: str = "data/course_data.jsonl"):
+        self.path = path
+        self.file = None
+
+    def records(self) -> Generator[Dict, None, None]:
+        """Read the records in the log one at a time."""
+        if not os.path.exists(self.path):
+            return
+        # Read bytes, a crash can cut a multibyte character in half
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    yield json.loads(line.decode("utf-8"))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    continue
+
+    def completed_urls(self) -> Set[str]:
+        """URLs that have already been scraped."""
+        return {record["url"] for record in self.records()}
+
+    def append(self, record: Dict):
+        """Append a record and flush it to disk."""
+        if self.file is None:
+            self.file = open(self.path, "ab+")
+            # Terminate a partial line left behind by a crash
+            if self.file.tell() > 0:
+                self.file.seek(-1, os.SEEK_END)
+                if self.file.read(1) != b"\n":
+                    self.file.write(b"\n")
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self.file.write(line.encode("utf-8"))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def archive(self) -> str | None:
+        """
+        Move the log aside with a timestamp suffix so that the next run starts
+        from scratch. Returns the archive path, or None if there is no log.
+        """
+        self.close()
+        if not os.path.exists(self.path):
+            return None
+        root, ext = os.path.splitext(self.path)
+        archive_path = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        os.replace(self.path, archive_path)
+        return archive_path
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Build the course table from the log in a single pass."""
+        df = pd.DataFrame.from_records(self.records(), columns=COLUMNS)
+        return df.drop_duplicates("url", keep="last").reset_index(drop=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
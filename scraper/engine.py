@@ -0,0 +1,187 @@
+import time
+import threading
+
+from typing import Dict, Generator, Iterable, Tuple
+from urllib.parse import urlparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from scraper.scraping_utils import get_driver, scrape_course_data
+from scraper.http_fetch import HttpFetcher, NotModified
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Allows `rate` requests per second on average
+    with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DriverPool:
+    """
+    Pool of long-lived headless Chrome drivers. Drivers are started lazily
+    and reused across URLs, and a driver that has crashed is replaced. A
+    driver that fails to start gives its slot back, so callers waiting for
+    a driver are never blocked by a slot that no driver holds.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle = []
+        self.created = 0
+        self.condition = threading.Condition()
+
+    def _acquire(self):
+        with self.condition:
+            while not self.idle and self.created >= self.size:
+                self.condition.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+
+        # Start Chrome outside the lock and free the slot if it fails
+        try:
+            return get_driver()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def _release_slot(self):
+        with self.condition:
+            self.created -= 1
+            self.condition.notify()
+
+    @staticmethod
+    def _is_alive(driver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def driver(self):
+        """Check out a driver for the duration of the context."""
+        driver = self._acquire()
+        try:
+            yield driver
+        finally:
+            if self._is_alive(driver):
+                with self.condition:
+                    self.idle.append(driver)
+                    self.condition.notify()
+            else:
+                # A replacement is started lazily by the next caller
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                self._release_slot()
+
+    def close(self):
+        """Quit all idle drivers."""
+        with self.condition:
+            drivers, self.idle = self.idle, []
+            self.created -= len(drivers)
+        for driver in drivers:
+            driver.quit()
+
+
+class ScrapeEngine:
+    """
+    Concurrent scraper with a pool of reusable drivers. At most `max_workers`
+    pages are scraped at a time, and requests to each host are limited to
+    `requests_per_second` on average with bursts of up to `burst` requests.
+
+    With `backend="http"` the pages are fetched over plain HTTP and a browser
+    is only started for the pages where that fails. With `backend="selenium"`
+    every page is rendered in Chrome. `validators` holds the HTTP validators
+    of earlier fetches for conditional requests, see HttpFetcher.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        requests_per_second: float = 1.0,
+        burst: int = 2,
+        backend: str = "http",
+        validators: Dict[str, Dict] = None,
+    ):
+        if backend not in ["http", "selenium"]:
+            raise ValueError(f"Unknown backend '{backend}'")
+        self.backend = backend
+        self.http = HttpFetcher(validators=validators)
+        self.max_workers = max_workers
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.pool = DriverPool(max_workers)
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            return self.buckets[host]
+
+    def _scrape(self, url: str) -> dict:
+        self._bucket(url).acquire()
+        if self.backend == "http":
+            try:
+                return self.http.scrape_course_data(url)
+            except NotModified:
+                raise
+            except Exception as e:
+                print(f"HTTP fetch failed for {url} ({e}), falling back to Selenium")
+                # The stored validators do not describe the Selenium result
+                self.http.validators.pop(url, None)
+                self._bucket(url).acquire()
+
+        with self.pool.driver() as driver:
+            return scrape_course_data(url, driver=driver)
+
+    def scrape(self, urls: Iterable[str]) -> Generator[Tuple[str, dict, Exception], None, None]:
+        """
+        Scrape the URLs concurrently. Yields (url, data, error) tuples in
+        completion order, where either data or error is None.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._scrape, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    yield url, future.result(), None
+                except Exception as e:
+                    yield url, None, e
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
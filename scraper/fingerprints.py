@@ -0,0 +1,94 @@
+import os
+import ast
+import json
+import time
+import hashlib
+import pandas as pd
+
+from typing import Dict, Iterable, List
+
+
+def fingerprint(record: Dict) -> str:
+    """Hash of the extracted course data that matters downstream."""
+    content = {key: record.get(key) for key in ["course_code", "course_name", "credits", "course_info"]}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Per-URL fingerprints of the scraped course data, stored as JSON. Each
+    entry holds the hash of the extracted data, the course code, the last
+    fetch time and the HTTP validators (ETag, Last-Modified) of the page.
+    """
+
+    def __init__(self, path: str = "data/fingerprints.json"):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_stale(self, url: str, max_age: float) -> bool:
+        """Whether the URL has never been fetched or was fetched over max_age seconds ago."""
+        entry = self.entries.get(url)
+        return entry is None or time.time() - entry["fetched_at"] > max_age
+
+    def validators(self) -> Dict[str, Dict]:
+        """The HTTP validators of all URLs, for conditional requests."""
+        return {
+            url: {"etag": e.get("etag"), "last_modified": e.get("last_modified")}
+            for url, e in self.entries.items()
+        }
+
+    def touch(self, url: str):
+        """Mark an unchanged URL as freshly fetched."""
+        self.entries[url]["fetched_at"] = time.time()
+
+    def update(
+        self, url: str, record: Dict, validators: Dict = None, fetched_at: float = None
+    ) -> bool:
+        """
+        Store the fingerprint of a freshly scraped record.
+        Returns True if the course data is new or has changed.
+        """
+        digest = fingerprint(record)
+        previous = self.entries.get(url, {})
+        validators = validators or {}
+        self.entries[url] = {
+            "hash": digest,
+            "course_code": record["course_code"],
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+        }
+        return previous.get("hash") != digest
+
+    def seed_from_csv(self, csv_path: str):
+        """
+        Fingerprint the courses of a course table written by scrape_sisu, e.g.
+        when the store is missing. The rows count as fetched when the file was
+        last modified, and have no HTTP validators.
+        """
+        course_data = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        fetched_at = os.path.getmtime(csv_path)
+        for record in course_data.to_dict("records"):
+            # The course info dicts are written as their Python repr
+            record["course_info"] = ast.literal_eval(record["course_info"] or "{}")
+            self.update(record["url"], record, fetched_at=fetched_at)
+
+    def prune(self, urls: Iterable[str]) -> List[Dict]:
+        """
+        Drop the URLs that are no longer listed. Returns the removed entries.
+        """
+        urls = set(urls)
+        removed = [url for url in self.entries if url not in urls]
+        return [self.entries.pop(url) for url in removed]
+
+    def save(self):
+        """Write the store atomically."""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
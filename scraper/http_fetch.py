@@ -0,0 +1,149 @@
+import re
+import sys
+import json
+import html
+import threading
+import requests
+
+from typing import Dict, List
+from urllib.parse import urlparse
+
+# Sisu renders the course pages client side from its public course unit API
+API_URL = "https://{host}/kori/api/course-units/{unit_id}"
+
+# Same section titles as the Finnish course page read by get_course_info
+SECTIONS = {
+    "outcomes": "OSAAMISTAVOITTEET",
+    "content": "ASIASISÄLTÖ",
+    "additional": "LISÄTIEDOT",
+}
+
+BLOCK_END = re.compile(r"<br\s*/?>|</(p|div|li|h\d|tr|ul|ol)>", re.IGNORECASE)
+TAG = re.compile(r"<[^>]+>")
+
+
+def get_api_url(url: str) -> str:
+    """
+    Map a course page URL such as
+    https://sisu.aalto.fi/student/courseunit/otm-... to its API URL.
+    """
+    parsed = urlparse(url)
+    segments = parsed.path.strip("/").split("/")
+    if "courseunit" in segments[:-1]:
+        unit_id = segments[segments.index("courseunit") + 1]
+    else:
+        unit_id = segments[-1]
+    return API_URL.format(host=parsed.netloc, unit_id=unit_id)
+
+
+def localized(value, lang: str = "fi") -> str:
+    """
+    Pick the given language from a Sisu localized string, falling back to
+    any other available language like the course page does.
+    """
+    if not value:
+        return ""
+    if lang in value and value[lang]:
+        return value[lang]
+    return next((v for v in value.values() if v), "")
+
+
+def html_to_lines(text: str) -> List[str]:
+    """
+    Convert an HTML fragment to the non-empty text lines shown on the page.
+    """
+    text = BLOCK_END.sub("\n", text)
+    text = html.unescape(TAG.sub("", text))
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+def get_credits(credits: dict) -> str:
+    """
+    Format the credit range the way the course page shows it, e.g. '5' or '3–5'.
+    """
+    low, high = credits.get("min"), credits.get("max")
+    if high is None or low == high:
+        return f"{low:g}"
+    return f"{low:g}–{high:g}"
+
+
+def parse_course_unit(unit: dict, url: str) -> Dict:
+    """
+    Extract the course data from a course unit API response. Returns the
+    same fields as scrape_course_data.
+    """
+    course_info = {
+        title: html_to_lines(localized(unit.get(key)))
+        for key, title in SECTIONS.items()
+    }
+    if not any(course_info.values()):
+        course_info = {}
+
+    return {
+        "course_code": unit["code"],
+        "course_name": localized(unit["name"]),
+        "credits": get_credits(unit["credits"]),
+        "course_info": course_info,
+        "url": url,
+    }
+
+
+class NotModified(Exception):
+    """Raised when a conditional request finds the page unchanged."""
+
+
+class HttpFetcher:
+    """
+    Fetch course pages over plain HTTP from the Sisu API instead of rendering
+    them in a browser. Each thread gets its own keep-alive session.
+
+    `validators` maps URLs to their last seen ETag and Last-Modified headers.
+    They are sent as conditional request headers, and the mapping is updated
+    with the validators of every successful response.
+    """
+
+    def __init__(self, timeout: float = 10, validators: Dict[str, Dict] = None):
+        self.timeout = timeout
+        self.validators = validators if validators is not None else {}
+        self.local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+            self.local.session.headers["Accept"] = "application/json"
+        return self.local.session
+
+    def fetch(self, url: str) -> dict:
+        """Fetch the raw course unit JSON for a course page URL."""
+        headers = {}
+        validators = self.validators.get(url, {})
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        response = self.session.get(
+            get_api_url(url), headers=headers, timeout=self.timeout
+        )
+        if response.status_code == 304:
+            raise NotModified(url)
+        response.raise_for_status()
+
+        self.validators[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        return response.json()
+
+    def scrape_course_data(self, url: str) -> Dict:
+        """Scrape course data from the given URL."""
+        return parse_course_unit(self.fetch(url), url)
+
+
+if __name__ == "__main__":
+    # Parse a saved API response offline:
+    # python -m scraper.http_fetch page.json https://sisu.aalto.fi/student/courseunit/otm-...
+    with open(sys.argv[1], "r") as f:
+        unit = json.load(f)
+    print(parse_course_unit(unit, sys.argv[2] if len(sys.argv) > 2 else ""))
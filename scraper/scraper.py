@@ -1,50 +1,135 @@
-import time
-import random
+import os
 import pandas as pd
 
-from scraper.scraping_utils import get_urls, scrape_course_data
+from scraper.scraping_utils import get_urls
+from scraper.engine import ScrapeEngine
+from scraper.checkpoint import ScrapeLog
+from scraper.http_fetch import NotModified
+from scraper.fingerprints import FingerprintStore
 
 
-def scrape_sisu() -> pd.DataFrame:
-
-    # Store the course data into a dataframe
-    course_data = pd.DataFrame(
-        columns=[
-            "course_code",
-            "course_name",
-            "credits",
-            "course_info",
-            "url",
-        ]
-    )
+def scrape_sisu(
+    max_workers: int = 4,
+    requests_per_second: float = 1.0,
+    backend: str = "http",
+    resume: bool = True,
+    log_path: str = "data/course_data.jsonl",
+    fingerprints_path: str = "data/fingerprints.json",
+) -> pd.DataFrame:
+    """
+    Scrape all course pages. Records are checkpointed to the JSONL log at
+    log_path, and with resume=True a run that was interrupted continues from
+    where it stopped. With resume=False a leftover log is archived and every
+    URL is scraped again. The log is archived once the run completes, so the
+    next run starts from scratch and data/course_data.csv stays the only
+    course table that refresh_sisu updates. The fingerprint store used by
+    refresh_sisu is rebuilt from the scraped courses.
+    """
 
     # Get the URLs from the text files
     urls = get_urls("urls/")
     print(f"Found {len(urls)} URLs to scrape")
 
-    for idx, url in enumerate(urls):
-        print(f"Scraping {idx+1}/{len(urls)}")
+    with ScrapeLog(log_path) as log:
+        if not resume and (archived := log.archive()):
+            print(f"Archived the previous scrape log to {archived}")
+
+        # Resume from the URLs scraped by an earlier, interrupted run
+        completed = log.completed_urls()
+        todo = [url for url in urls if url not in completed]
+        print(f"Skipping {len(completed)} already scraped URLs")
+
+        # Drivers are reused across URLs and requests are rate limited per host
+        with ScrapeEngine(max_workers, requests_per_second, backend=backend) as engine:
+            for idx, (url, data, error) in enumerate(engine.scrape(todo)):
+                print(f"Scraping {idx+1}/{len(todo)}")
+
+                if error is not None:
+                    print(f"Failed to scrape {url} due to {error}")
+                    continue
 
-        if idx % 50 == 0:
-            print(f"Saving the checkpoint data...")
-            course_data.to_csv(f"data/course_data_{idx}.csv", index=False)
+                log.append(data)
 
-        try:
-            # Scrape the course data
-            data = scrape_course_data(url)
-            course_data = pd.concat(
-                [course_data, pd.DataFrame([data])], ignore_index=True
-            )
+        course_data = log.to_dataframe()
 
-        except Exception as e:
-            print(f"Failed to scrape {url} due to {e}")
-            continue
+        # Fingerprint the scraped courses so that the next refresh only
+        # re-scrapes pages that are stale or changed
+        store = FingerprintStore(fingerprints_path)
+        store.prune(course_data["url"])
+        for record in course_data.to_dict("records"):
+            store.update(record["url"], record, engine.http.validators.get(record["url"]))
+        store.save()
 
-        time.sleep(random.uniform(1, 3))  # avoid getting blocked ;-)
+        print(f"Archived the scrape log to {log.archive()}")
 
     return course_data
 
 
+def refresh_sisu(
+    max_age_days: float = 30,
+    max_workers: int = 4,
+    requests_per_second: float = 1.0,
+) -> list:
+    """
+    Refresh data/course_data.csv by re-scraping only the pages that are new
+    or were last fetched over max_age_days ago. Pages with HTTP validators are
+    fetched conditionally. Rows whose extracted data changed are replaced and
+    rows whose URL is no longer listed are dropped. The codes of the changed
+    and removed courses are written to data/changed_course_codes.txt for the
+    translation and embedding steps. A missing fingerprint store is built
+    from data/course_data.csv first.
+
+    Returns:
+        list: The changed and removed course codes.
+    """
+    urls = get_urls("urls/")
+    path = "data/course_data.csv"
+    store = FingerprintStore("data/fingerprints.json")
+    if not store.entries and os.path.exists(path):
+        print(f"Building the fingerprint store from {path}")
+        store.seed_from_csv(path)
+
+    # Forget the courses whose URLs are no longer listed
+    removed = store.prune(urls)
+    print(f"{len(removed)} URLs were removed")
+
+    todo = [url for url in urls if store.is_stale(url, max_age_days * 24 * 3600)]
+    print(f"Refreshing {len(todo)}/{len(urls)} stale URLs")
+
+    changed = []
+    with ScrapeEngine(
+        max_workers, requests_per_second, validators=store.validators()
+    ) as engine:
+        for url, data, error in engine.scrape(todo):
+            if isinstance(error, NotModified):
+                store.touch(url)
+            elif error is not None:
+                print(f"Failed to scrape {url} due to {error}")
+            elif store.update(url, data, engine.http.validators.get(url)):
+                changed.append(data)
+    store.save()
+    print(f"{len(changed)} courses changed")
+
+    # Replace the changed rows and drop the removed ones in the course table
+    course_data = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+    if len(course_data):
+        course_data = course_data[course_data["url"].isin(urls)]
+    if changed:
+        changed_data = pd.DataFrame(changed)
+        if len(course_data):
+            course_data = course_data[~course_data["url"].isin(changed_data["url"])]
+        course_data = pd.concat([course_data, changed_data], ignore_index=True)
+    if changed or removed:
+        course_data.to_csv(path, index=False)
+
+    # Removed courses are passed on too, so that they are dropped downstream
+    codes = [data["course_code"] for data in changed]
+    codes += [entry["course_code"] for entry in removed]
+    with open("data/changed_course_codes.txt", "w") as f:
+        f.write("\n".join(codes))
+    return codes
+
+
 if __name__ == "__main__":
     df = scrape_sisu()
     df.to_csv("data/course_data.csv", index=False)
@@ -19,7 +19,7 @@ def get_urls(path):
     return list(urls)
 
 
-def get_driver(url):
+def get_driver(url=None):
     """
     Return a driver instance running headless
     """
@@ -27,7 +27,8 @@ def get_driver(url):
     options.add_argument("--headless=new")
     options.add_argument("--disable-extensions")
     driver = webdriver.Chrome(options=options)
-    driver.get(url)
+    if url is not None:
+        driver.get(url)
     return driver
 
 
@@ -86,10 +87,18 @@ def get_course_info(driver) -> Dict[str, str]:
     return content_dict
 
 
-def scrape_course_data(url):
-    """Scrape course data from the given URL."""
+def scrape_course_data(url, driver=None):
+    """Scrape course data from the given URL.
+
+    If a driver is given it is reused and left running,
+    otherwise a new driver is started and quit afterwards.
+    """
     # 1. Init the driver
-    driver = get_driver(url)
+    own_driver = driver is None
+    if own_driver:
+        driver = get_driver(url)
+    else:
+        driver.get(url)
 
     # 2. Get the course code
     course_code = get_course_code(driver)
@@ -100,7 +109,8 @@ def scrape_course_data(url):
     # 4. Get the course info
     course_info = get_course_info(driver)
 
-    driver.quit()
+    if own_driver:
+        driver.quit()
 
     # 5. Return the course data
     return {
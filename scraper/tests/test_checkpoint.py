@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from scraper.checkpoint import ScrapeLog
+
+RECORD = {"url": "a", "course_code": "A-1", "course_info": {"ASIASISÄLTÖ": ["Kielimallit"]}}
+
+
+def encode(record):
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@pytest.mark.parametrize(
+    "tail",
+    [
+        # The crash cut the line after a multibyte character
+        '{"url": "b", "course_info": "ASIASISÄ'.encode("utf-8"),
+        # The crash cut a multibyte character in half
+        '{"url": "b", "course_info": "ASIASISÄ'.encode("utf-8")[:-1],
+    ],
+)
+def test_resume_after_partial_line(tmp_path, tail):
+    path = tmp_path / "course_data.jsonl"
+    path.write_bytes(encode(RECORD) + tail)
+
+    with ScrapeLog(str(path)) as log:
+        assert log.completed_urls() == {"a"}
+        log.append({"url": "c", "course_code": "C-3", "course_info": {}})
+
+    assert ScrapeLog(str(path)).completed_urls() == {"a", "c"}
+
+
+def test_archive(tmp_path):
+    path = tmp_path / "course_data.jsonl"
+    with ScrapeLog(str(path)) as log:
+        assert log.archive() is None
+        log.append(RECORD)
+        archived = log.archive()
+
+    assert not path.exists()
+    assert ScrapeLog(archived).completed_urls() == {"a"}
@@ -0,0 +1,90 @@
+import pytest
+import requests
+
+# The engine imports the Selenium scraper for its fallback
+pytest.importorskip("selenium")
+
+from scraper import engine
+from scraper.tests.test_http_fetch import FakeResponse, FakeSession
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise RuntimeError("driver crashed")
+        return ""
+
+    def quit(self):
+        pass
+
+
+def test_driver_pool_frees_slot_when_chrome_fails_to_start(monkeypatch):
+    def get_driver(url=None):
+        raise RuntimeError("no chrome")
+
+    monkeypatch.setattr(engine, "get_driver", get_driver)
+    pool = engine.DriverPool(1)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            with pool.driver():
+                pass
+    assert pool.created == 0
+
+
+def test_driver_pool_replaces_crashed_driver(monkeypatch):
+    monkeypatch.setattr(engine, "get_driver", lambda url=None: FakeDriver())
+    pool = engine.DriverPool(1)
+
+    with pool.driver() as driver:
+        driver.alive = False
+    with pool.driver() as replacement:
+        pass
+
+    assert replacement is not driver
+    assert pool.created == 1
+    assert pool.idle == [replacement]
+
+
+def test_http_error_falls_back_to_selenium(monkeypatch):
+    monkeypatch.setattr(engine, "get_driver", lambda url=None: FakeDriver())
+    monkeypatch.setattr(
+        engine,
+        "scrape_course_data",
+        lambda url, driver=None: {"url": url, "backend": "selenium"},
+    )
+
+    monkeypatch.setattr(requests, "Session", lambda: FakeSession(FakeResponse(500)))
+    validators = {"https://sisu.aalto.fi/student/courseunit/otm-1": {"etag": '"v1"'}}
+    with engine.ScrapeEngine(
+        max_workers=2, requests_per_second=1000, burst=10, validators=validators
+    ) as scraper:
+        results = list(scraper.scrape(["https://sisu.aalto.fi/student/courseunit/otm-1"]))
+
+    # The old validators do not describe the page scraped with Selenium
+    assert validators == {}
+
+    assert results == [
+        (
+            "https://sisu.aalto.fi/student/courseunit/otm-1",
+            {"url": "https://sisu.aalto.fi/student/courseunit/otm-1", "backend": "selenium"},
+            None,
+        )
+    ]
+
+
+def test_not_modified_does_not_fall_back(monkeypatch):
+    def get_driver(url=None):
+        raise AssertionError("Selenium should not be used")
+
+    monkeypatch.setattr(engine, "get_driver", get_driver)
+
+    monkeypatch.setattr(requests, "Session", lambda: FakeSession(FakeResponse(304)))
+    with engine.ScrapeEngine(max_workers=1, requests_per_second=1000, burst=10) as scraper:
+        [(url, data, error)] = list(scraper.scrape(["https://sisu.aalto.fi/student/courseunit/otm-1"]))
+
+    assert data is None
+    assert isinstance(error, engine.NotModified)
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from scraper.fingerprints import FingerprintStore
+
+RECORDS = [
+    {
+        "course_code": "ELEC-E5550",
+        "course_name": "Statistical Natural Language Processing D",
+        "credits": "5",
+        "course_info": {"OSAAMISTAVOITTEET": ["Kielimallit"], "ASIASISÄLTÖ": [], "LISÄTIEDOT": []},
+        "url": "https://sisu.aalto.fi/student/courseunit/otm-1",
+    },
+    {
+        "course_code": "TU-E2020",
+        "course_name": "Advanced Operations Management",
+        "credits": "3–5",
+        "course_info": {},
+        "url": "https://sisu.aalto.fi/student/courseunit/otm-2",
+    },
+]
+
+
+def test_seed_from_csv_matches_fresh_scrape(tmp_path):
+    # Written the same way as scrape_sisu writes data/course_data.csv
+    csv_path = tmp_path / "course_data.csv"
+    pd.DataFrame(RECORDS).to_csv(csv_path, index=False)
+
+    store = FingerprintStore(str(tmp_path / "fingerprints.json"))
+    store.seed_from_csv(str(csv_path))
+
+    for record in RECORDS:
+        assert not store.is_stale(record["url"], max_age=3600)
+        assert store.update(record["url"], record) is False
+
+
+def test_prune(tmp_path):
+    store = FingerprintStore(str(tmp_path / "fingerprints.json"))
+    for record in RECORDS:
+        store.update(record["url"], record)
+
+    removed = store.prune([RECORDS[0]["url"]])
+
+    assert [entry["course_code"] for entry in removed] == ["TU-E2020"]
+    assert list(store.entries) == [RECORDS[0]["url"]]
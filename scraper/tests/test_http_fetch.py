@@ -0,0 +1,156 @@
+import json
+from pathlib import Path
+
+import pytest
+import requests
+
+from scraper.http_fetch import (
+    HttpFetcher,
+    NotModified,
+    get_api_url,
+    get_credits,
+    parse_course_unit,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+URL = "https://sisu.aalto.fi/student/courseunit/otm-0d3ad5e4-4b6a-4a8a-9b0b-2f8e2f2c1f3a"
+
+# Section titles read from the course page by scraping_utils.get_course_info
+SELENIUM_SECTIONS = ["OSAAMISTAVOITTEET", "ASIASISÄLTÖ", "LISÄTIEDOT"]
+
+
+def load_fixture(name):
+    with open(FIXTURES / name, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_parse_course_unit():
+    course = parse_course_unit(load_fixture("course_unit.json"), URL)
+
+    assert course["course_code"] == "ELEC-E5550"
+    assert course["course_name"] == "Statistical Natural Language Processing D"
+    assert course["credits"] == "3–5"
+    assert course["url"] == URL
+    assert list(course["course_info"]) == SELENIUM_SECTIONS
+    assert course["course_info"]["OSAAMISTAVOITTEET"] == [
+        "Kurssin suoritettuaan opiskelija",
+        "tuntee luonnollisen kielen käsittelyn tilastolliset menetelmät,",
+        "osaa soveltaa syväoppimista & kielimalleja.",
+    ]
+    assert course["course_info"]["ASIASISÄLTÖ"] == [
+        "Kielimallit, konekääntäminen",
+        "ja tiedonhaku.",
+    ]
+    # Falls back to English when there is no Finnish text
+    assert course["course_info"]["LISÄTIEDOT"] == ["Teaching language: English"]
+
+
+def test_parse_course_unit_without_info():
+    course = parse_course_unit(load_fixture("course_unit_no_info.json"), URL)
+
+    assert course["course_name"] == "Advanced Operations Management"
+    assert course["credits"] == "5"
+    assert course["course_info"] == {}
+
+
+@pytest.mark.parametrize(
+    "credits, expected",
+    [
+        ({"min": 5, "max": 5}, "5"),
+        ({"min": 5, "max": None}, "5"),
+        ({"min": 3, "max": 5}, "3–5"),
+        ({"min": 1.5, "max": 3}, "1.5–3"),
+    ],
+)
+def test_get_credits(credits, expected):
+    assert get_credits(credits) == expected
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://sisu.aalto.fi/student/courseunit/otm-0d3ad5e4-4b6a-4a8a-9b0b-2f8e2f2c1f3a",
+        "https://sisu.aalto.fi/student/courseunit/otm-0d3ad5e4-4b6a-4a8a-9b0b-2f8e2f2c1f3a/",
+        "https://sisu.aalto.fi/student/courseunit/otm-0d3ad5e4-4b6a-4a8a-9b0b-2f8e2f2c1f3a/brochure",
+    ],
+)
+def test_get_api_url(url):
+    assert get_api_url(url) == (
+        "https://sisu.aalto.fi/kori/api/course-units/"
+        "otm-0d3ad5e4-4b6a-4a8a-9b0b-2f8e2f2c1f3a"
+    )
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class FakeSession:
+    """Serves the queued responses and records the requests."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.headers = {}
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, headers))
+        return self.responses.pop(0)
+
+
+def make_fetcher(session, validators=None):
+    fetcher = HttpFetcher(validators=validators)
+    fetcher.local.session = session
+    return fetcher
+
+
+def test_fetch_stores_validators():
+    session = FakeSession(
+        FakeResponse(
+            body=load_fixture("course_unit.json"),
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 02 Sep 2024 10:00:00 GMT"},
+        )
+    )
+    fetcher = make_fetcher(session)
+
+    course = fetcher.scrape_course_data(URL)
+
+    assert course["course_code"] == "ELEC-E5550"
+    assert session.requests == [(get_api_url(URL), {})]
+    assert fetcher.validators[URL] == {
+        "etag": '"v1"',
+        "last_modified": "Mon, 02 Sep 2024 10:00:00 GMT",
+    }
+
+
+def test_fetch_sends_conditional_headers_and_raises_not_modified():
+    validators = {URL: {"etag": '"v1"', "last_modified": "Mon, 02 Sep 2024 10:00:00 GMT"}}
+    session = FakeSession(FakeResponse(status_code=304))
+    fetcher = make_fetcher(session, validators)
+
+    with pytest.raises(NotModified):
+        fetcher.fetch(URL)
+
+    assert session.requests[0][1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 02 Sep 2024 10:00:00 GMT",
+    }
+    # The validators of an unchanged page are kept
+    assert fetcher.validators[URL]["etag"] == '"v1"'
+
+
+def test_fetch_raises_on_http_error():
+    fetcher = make_fetcher(FakeSession(FakeResponse(status_code=500)))
+    with pytest.raises(requests.HTTPError):
+        fetcher.fetch(URL)
+    assert URL not in fetcher.validators